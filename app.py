@@ -1,11 +1,25 @@
-from flask import Flask, render_template, request, redirect, session, send_from_directory, jsonify
-import json, os, math, calendar
-from datetime import datetime, timedelta, time
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from pywebpush import webpush, WebPushException
+from flask import Flask, render_template, request, redirect, session, send_file, jsonify, url_for, abort, Response
+import json, os, math, calendar, threading, sqlite3, random, io, re, hashlib, gzip, mimetypes, tempfile, uuid
+from time import monotonic, sleep, time as unix_time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from pywebpush import WebPusher, WebPushException
+from py_vapid import Vapid
 from pymongo import MongoClient
-from werkzeug.utils import secure_filename
+from urllib.parse import urlparse
+import requests
+import click
+from googleapiclient.errors import HttpError
+from PIL import Image, ImageOps, UnidentifiedImageError
+import brotli
+from transcript_parser import normalize_transcript, parse_transcript, ParseCache
+from bill_export import export_bills
+from billing import calculate_ot, get_remarks, summarize_fleet
+from month_archive import MonthArchive, month_doc, sheet_period
+from driver_registry import DriverRegistry
+from sheets_client import SheetsClient
+from sheets_quota import QuotaGovernor
+from telemetry import log, span, bind, inc, begin_request, end_request, set_gauge, render as render_metrics
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey"
@@ -13,28 +27,69 @@ ADMIN_CODE = os.getenv("ADMIN_CODE", "admin1234")
 
 app.permanent_session_lifetime = timedelta(days=3650)
 
-with open("driver.json", "r") as f:
-    DRIVERS = json.load(f)
+DRIVER_RELOAD_SECONDS = float(os.getenv("DRIVER_RELOAD_SECONDS", "2"))
+DRIVERS = DriverRegistry("driver.json", check_seconds=DRIVER_RELOAD_SECONDS)
 
 sa_json = os.getenv("GOOGLE_SERVICE_ACCOUNT_JSON")
 if not sa_json:
     raise RuntimeError("GOOGLE_SERVICE_ACCOUNT_JSON not set")
 
-creds = service_account.Credentials.from_service_account_info(
-    json.loads(sa_json),
-    scopes=["https://www.googleapis.com/auth/spreadsheets"]
+# Built lazily on first use; the refresher thread warms it and keeps the token fresh.
+sheets = SheetsClient(json.loads(sa_json), api_endpoint=os.getenv("SHEETS_API_ENDPOINT") or None)
+if os.getenv("SHEETS_TOKEN_REFRESH", "1") != "0":
+    sheets.start_refresher()
+
+def sheets_http():
+    """httplib2 isn't thread-safe, so worker threads each get their own authorized client."""
+    return sheets.http()
+
+# Per-minute Sheets quotas for the service account's project. Driver requests
+# get priority; journal flushes, month resets and fleet reads run as "bulk".
+SHEETS_PROJECT = sheets.creds.project_id
+SHEETS_QUOTA   = QuotaGovernor(
+    reads_per_minute=int(os.getenv("SHEETS_READS_PER_MINUTE", "60")),
+    writes_per_minute=int(os.getenv("SHEETS_WRITES_PER_MINUTE", "60")),
 )
-sheets = build("sheets", "v4", credentials=creds)
+
+def sheets_execute(req, op, priority="interactive"):
+    """Run a Sheets request on this thread's client, under the quota governor, timed as a span."""
+    def run():
+        with span("sheets", op):
+            return req.execute(http=sheets_http())
+    return SHEETS_QUOTA.call(run, SHEETS_PROJECT, op, priority)
 
 # ---------- VAPID ----------
 VAPID_PUBLIC_KEY  = os.getenv("VAPID_PUBLIC_KEY",  "BOuqrSKgWKp_oxCo3B21vfHo2_-zCD-MbkEDUljwkLE01U4bt_UU1Oah_gpgpbSoE-3QntQYPo1WxcbU8iVhX5A")
 VAPID_PRIVATE_KEY = os.getenv("VAPID_PRIVATE_KEY", "h_QIorXoPcAXH_3nTHYTBSSJXvtLsr2-zZvc0MFZ_lw")
 VAPID_EMAIL       = os.getenv("VAPID_EMAIL", "mailto:admin@brajwasitravels.com")
+VAPID_TOKEN_TTL   = 12 * 60 * 60
+VAPID_REFRESH_AT  = 10 * 60      # re-sign when a cached token has less than this left
+
+# Parse the key once; pywebpush.webpush() would re-parse it and re-sign a JWT per message.
+_vapid_key     = Vapid.from_string(private_key=VAPID_PRIVATE_KEY)
+_vapid_headers = {}              # audience origin -> (headers, exp)
+_vapid_lock    = threading.Lock()
+
+def vapid_headers(endpoint):
+    """Signed VAPID headers for the endpoint's origin, cached until shortly before expiry."""
+    url = urlparse(endpoint)
+    aud = f"{url.scheme}://{url.netloc}"
+    now = int(unix_time())
+    with _vapid_lock:
+        hit = _vapid_headers.get(aud)
+        if hit and hit[1] - now > VAPID_REFRESH_AT:
+            return dict(hit[0])
+    exp     = now + VAPID_TOKEN_TTL
+    headers = _vapid_key.sign({"sub": VAPID_EMAIL, "aud": aud, "exp": exp})
+    with _vapid_lock:
+        _vapid_headers[aud] = (headers, exp)
+    return dict(headers)
 
 # ---------- MongoDB ----------
 MONGO_URI     = os.getenv("MONGO_URI", "")
 _mongo_client = None
 _mongo_col    = None
+_mongo_lock   = threading.Lock()
 
 def get_col():
     """Return MongoDB collection, connecting once and reusing. None if unavailable."""
@@ -42,17 +97,23 @@ def get_col():
     if _mongo_col is not None:
         return _mongo_col
     if not MONGO_URI:
-        print("⚠️  MONGO_URI not set — using file fallback for subscriptions")
-        return None
-    try:
-        _mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        _mongo_client.admin.command("ping")
-        _mongo_col = _mongo_client["brajwasi"]["subscriptions"]
-        print("✅ MongoDB connected")
-        return _mongo_col
-    except Exception as e:
-        print(f"❌ MongoDB connection failed: {e}")
+        log("warning", "mongo.not_configured", fallback="file")
         return None
+    # One MongoClient (and its connection pool) per process, even when several
+    # request threads arrive here at once.
+    with _mongo_lock:
+        if _mongo_col is not None:
+            return _mongo_col
+        try:
+            _mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+            with span("mongo", "ping"):
+                _mongo_client.admin.command("ping")
+            _mongo_col = _mongo_client["brajwasi"]["subscriptions"]
+            log("info", "mongo.connected")
+            return _mongo_col
+        except Exception as e:
+            log("error", "mongo.connect_failed", error=str(e))
+            return None
 
 # ---------- Subscription CRUD (MongoDB primary, file fallback) ----------
 SUBS_FILE = "subscriptions.json"
@@ -62,28 +123,60 @@ SUBS_FILE = "subscriptions.json"
 ENTRY_PHOTO_DIR = os.path.join("static", "uploads")
 ENTRY_PHOTO_SETTINGS_FILE = "entry_photo_settings.json"
 ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif"}
+# Uploads are re-encoded into these widths as WebP plus a JPEG fallback. Names
+# carry a content hash (entry_photo.<hash>.<w>w.<ext>) so they can be cached forever.
+ENTRY_PHOTO_WIDTHS = (360, 720, 1080)
+ENTRY_PHOTO_VARIANT_RE = re.compile(r"^entry_photo\.[0-9a-f]{10}\.\d+w\.(webp|jpg)$")
 
 
 def allowed_image_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_IMAGE_EXTENSIONS
 
 
+# Parsed settings are cached per process and keyed on the settings file's mtime,
+# so a save in another gunicorn worker is picked up with one stat() call.
+_entry_photo_cache = {"mtime": None, "settings": None}
+_entry_photo_lock  = threading.Lock()
+
+def _settings_mtime():
+    try:
+        return os.stat(ENTRY_PHOTO_SETTINGS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def invalidate_entry_photo_settings():
+    with _entry_photo_lock:
+        _entry_photo_cache.update(mtime=None, settings=None)
+
 def load_entry_photo_settings():
     """Return admin-controlled entry photo settings."""
-    default = {"mode": "hide", "url": "", "filename": ""}
+    mtime = _settings_mtime()
+    with _entry_photo_lock:
+        if _entry_photo_cache["settings"] is not None and _entry_photo_cache["mtime"] == mtime:
+            return dict(_entry_photo_cache["settings"])
+    settings = _read_entry_photo_settings()
+    with _entry_photo_lock:
+        _entry_photo_cache.update(mtime=mtime, settings=settings)
+    return dict(settings)
+
+def _read_entry_photo_settings():
+    default = {"mode": "hide", "url": "", "filename": "", "variants": {}}
     if os.path.exists(ENTRY_PHOTO_SETTINGS_FILE):
         try:
             with open(ENTRY_PHOTO_SETTINGS_FILE, "r") as f:
                 data = json.load(f)
             default.update({k: data.get(k, default[k]) for k in default})
         except Exception as e:
-            print(f"❌ entry photo settings load error: {e}")
+            log("error", "entry_photo.settings_load_failed", error=str(e))
     filename = default.get("filename") or ""
     if filename:
         photo_path = os.path.join(ENTRY_PHOTO_DIR, filename)
         if os.path.exists(photo_path):
             default["url"] = f"/static/uploads/{filename}"
             default["version"] = int(os.path.getmtime(photo_path))
+            for fmt, widths in (default.get("variants") or {}).items():
+                default[f"srcset_{fmt}"] = ", ".join(
+                    f"/static/uploads/{name} {w}w" for w, name in widths)
         else:
             default["url"] = ""
             default["version"] = 0
@@ -95,9 +188,49 @@ def load_entry_photo_settings():
 
 
 def save_entry_photo_settings(settings):
-    with open(ENTRY_PHOTO_SETTINGS_FILE, "w") as f:
+    # Rename into place so another worker never caches a half-written file.
+    tmp = f"{ENTRY_PHOTO_SETTINGS_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
         json.dump(settings, f, indent=2)
+    os.replace(tmp, ENTRY_PHOTO_SETTINGS_FILE)
+    invalidate_entry_photo_settings()
+
+
+def _encode_variant(frame, fmt):
+    buf = io.BytesIO()
+    if fmt == "jpg":
+        if frame.mode != "RGB":
+            flat = Image.new("RGB", frame.size, "white")
+            flat.paste(frame, mask=frame.getchannel("A") if "A" in frame.getbands() else None)
+            frame = flat
+        frame.save(buf, "JPEG", quality=82, optimize=True, progressive=True)
+    else:
+        frame.save(buf, "WEBP", quality=80, method=4)
+    return buf.getvalue()
+
+def build_entry_photo_variants(stream):
+    """Re-encode an upload into ENTRY_PHOTO_WIDTHS as WebP + JPEG, metadata stripped.
 
+    Returns {"webp": [[width, filename], ...], "jpg": [...]} ordered by width.
+    """
+    try:
+        img = Image.open(stream)
+        img = ImageOps.exif_transpose(img)
+    except (UnidentifiedImageError, OSError):
+        raise ValueError("Could not read that image file")
+    img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    variants = {"webp": [], "jpg": []}
+    for w in sorted({min(w, img.width) for w in ENTRY_PHOTO_WIDTHS}):
+        h = max(1, round(img.height * w / img.width))
+        frame = img if w == img.width else img.resize((w, h), Image.LANCZOS)
+        for fmt in variants:
+            data = _encode_variant(frame, fmt)
+            name = f"entry_photo.{hashlib.sha1(data).hexdigest()[:10]}.{w}w.{fmt}"
+            with open(os.path.join(ENTRY_PHOTO_DIR, name), "wb") as f:
+                f.write(data)
+            variants[fmt].append([w, name])
+    return variants
 
 def save_uploaded_entry_photo(file_storage, mode):
     """Save admin-uploaded image and return updated settings."""
@@ -115,18 +248,20 @@ def save_uploaded_entry_photo(file_storage, mode):
         if not allowed_image_file(file_storage.filename):
             raise ValueError("Only PNG, JPG, JPEG, WEBP or GIF images are allowed")
 
+        variants = build_entry_photo_variants(file_storage.stream)
+        keep     = {name for widths in variants.values() for _, name in widths}
+
         # Delete old uploaded entry photos made by this feature.
         for old in os.listdir(ENTRY_PHOTO_DIR):
-            if old.startswith("entry_photo."):
+            if old.startswith("entry_photo.") and old not in keep:
                 try:
                     os.remove(os.path.join(ENTRY_PHOTO_DIR, old))
                 except Exception:
                     pass
 
-        ext = secure_filename(file_storage.filename).rsplit(".", 1)[1].lower()
-        filename = f"entry_photo.{ext}"
-        file_storage.save(os.path.join(ENTRY_PHOTO_DIR, filename))
+        filename = variants["jpg"][-1][1]
         current["filename"] = filename
+        current["variants"] = variants
         current["url"] = f"/static/uploads/{filename}"
 
     if not current.get("filename"):
@@ -136,6 +271,13 @@ def save_uploaded_entry_photo(file_storage, mode):
     save_entry_photo_settings(current)
     return current
 
+# The registry below keeps every subscription in memory. Writes go through to
+# Mongo (or the file) and bump a version number; readers re-check that version
+# at most every SUBS_SYNC_SECONDS, so other gunicorn workers catch up cheaply.
+SUBS_SYNC_SECONDS = float(os.getenv("SUBS_SYNC_SECONDS", "15"))
+_subs_lock  = threading.Lock()
+_subs_state = {"subs": None, "backend": None, "version": None, "checked": 0.0}
+
 def _file_load():
     if os.path.exists(SUBS_FILE):
         with open(SUBS_FILE) as f:
@@ -143,58 +285,238 @@ def _file_load():
     return {}
 
 def _file_save(subs):
-    with open(SUBS_FILE, "w") as f:
+    """Write to a temp file and rename, so readers never see a half-written file."""
+    tmp = f"{SUBS_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
         json.dump(subs, f, indent=2)
+    os.replace(tmp, SUBS_FILE)
+
+def _file_version():
+    try:
+        return os.stat(SUBS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def _mongo_version(col):
+    with span("mongo", "find_one"):
+        doc = col.database["meta"].find_one({"_id": "subscriptions"})
+    return doc["version"] if doc else 0
+
+def _bump_mongo_version(col):
+    with span("mongo", "update_one"):
+        col.database["meta"].update_one({"_id": "subscriptions"}, {"$inc": {"version": 1}}, upsert=True)
+
+def _registry_get(backend, version):
+    """Cached subs if the registry already holds this backend/version, else None."""
+    with _subs_lock:
+        st = _subs_state
+        if st["subs"] is not None and st["backend"] == backend and st["version"] == version:
+            st["checked"] = monotonic()
+            return dict(st["subs"])
+    return None
+
+def _registry_set(subs, backend, version):
+    with _subs_lock:
+        _subs_state.update(subs=dict(subs), backend=backend, version=version, checked=monotonic())
+
+def _registry_apply(backend, upsert=None, remove=()):
+    """Mirror a write into the registry. The version is left alone for Mongo so
+    the next sync re-reads once and picks up writes from other workers too."""
+    with _subs_lock:
+        st = _subs_state
+        if st["subs"] is None or st["backend"] != backend:
+            return
+        if upsert:
+            st["subs"].update(upsert)
+        for k in remove:
+            st["subs"].pop(k, None)
+        if backend == "file":
+            st["version"] = _file_version()
+
+def forget_subs():
+    """Drop the in-memory registry so the next load_subs() reads the backend."""
+    with _subs_lock:
+        _subs_state.update(subs=None, backend=None, version=None, checked=0.0)
 
 def load_subs():
+    with _subs_lock:
+        st = _subs_state
+        if st["subs"] is not None and monotonic() - st["checked"] < SUBS_SYNC_SECONDS:
+            return dict(st["subs"])
     col = get_col()
     if col is not None:
         try:
-            return {d["_id"]: d["sub"] for d in col.find()}
+            version = _mongo_version(col)
+            subs = _registry_get("mongo", version)
+            if subs is None:
+                with span("mongo", "find"):
+                    subs = {d["_id"]: d["sub"] for d in col.find()}
+                _registry_set(subs, "mongo", version)
+            return subs
         except Exception as e:
-            print(f"❌ load_subs MongoDB error: {e}")
-    return _file_load()
+            log("error", "subs.load_failed", backend="mongo", error=str(e))
+    version = _file_version()
+    subs = _registry_get("file", version)
+    if subs is None:
+        subs = _file_load()
+        _registry_set(subs, "file", version)
+    return subs
 
 def save_sub(car_key, sub_info):
     col = get_col()
     if col is not None:
         try:
-            col.update_one(
-                {"_id": car_key},
-                {"$set": {"sub": sub_info, "updated_at": datetime.utcnow()}},
-                upsert=True
-            )
-            print(f"✅ MongoDB: saved subscription for {car_key}")
+            with span("mongo", "update_one"):
+                col.update_one(
+                    {"_id": car_key},
+                    {"$set": {"sub": sub_info, "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            _bump_mongo_version(col)
+            _registry_apply("mongo", upsert={car_key: sub_info})
+            log("info", "subs.saved", backend="mongo", car=car_key)
             return
         except Exception as e:
-            print(f"❌ save_sub MongoDB error: {e}")
+            log("error", "subs.save_failed", backend="mongo", car=car_key, error=str(e))
     subs = _file_load()
     subs[car_key] = sub_info
     _file_save(subs)
-    print(f"✅ File: saved subscription for {car_key}")
+    _registry_apply("file", upsert={car_key: sub_info})
+    log("info", "subs.saved", backend="file", car=car_key)
 
 def delete_sub(car_key):
+    delete_subs([car_key])
+
+def delete_subs(car_keys):
+    """Remove one or more subscriptions in a single round trip."""
+    car_keys = list(car_keys)
+    if not car_keys:
+        return
     col = get_col()
     if col is not None:
         try:
-            col.delete_one({"_id": car_key})
-            print(f"🗑️  MongoDB: deleted subscription for {car_key}")
+            with span("mongo", "delete_many"):
+                result = col.delete_many({"_id": {"$in": car_keys}})
+            _bump_mongo_version(col)
+            _registry_apply("mongo", remove=car_keys)
+            log("info", "subs.deleted", backend="mongo", count=result.deleted_count)
             return
         except Exception as e:
-            print(f"❌ delete_sub MongoDB error: {e}")
+            log("error", "subs.delete_failed", backend="mongo", error=str(e))
     subs = _file_load()
-    subs.pop(car_key, None)
+    for k in car_keys:
+        subs.pop(k, None)
     _file_save(subs)
+    _registry_apply("file", remove=car_keys)
 
 # ---------- Push ----------
+PUSH_WORKERS      = int(os.getenv("PUSH_WORKERS", "16"))
+PUSH_TIMEOUT      = float(os.getenv("PUSH_TIMEOUT", "10"))
+PUSHER_CACHE_SIZE = 2048
+_push_sessions      = {}
+_push_sessions_lock = threading.Lock()
+_pushers            = {}         # (endpoint, p256dh, auth) -> WebPusher with decoded keys
+
+def push_session(endpoint):
+    """One keep-alive requests.Session per push-service host (fcm, mozilla, apple...)."""
+    host = urlparse(endpoint).netloc
+    with _push_sessions_lock:
+        sess = _push_sessions.get(host)
+        if sess is None:
+            sess = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=PUSH_WORKERS)
+            sess.mount("https://", adapter)
+            _push_sessions[host] = sess
+        return sess
+
+def web_pusher(sub_info):
+    """Reuse the WebPusher (and its base64-decoded p256dh/auth keys) for a subscription."""
+    keys = sub_info.get("keys") or {}
+    key  = (sub_info.get("endpoint", ""), keys.get("p256dh"), keys.get("auth"))
+    with _push_sessions_lock:
+        pusher = _pushers.get(key)
+    if pusher is None:
+        pusher = WebPusher(sub_info, requests_session=push_session(key[0]))
+        with _push_sessions_lock:
+            if len(_pushers) >= PUSHER_CACHE_SIZE:
+                _pushers.clear()
+            _pushers[key] = pusher
+    return pusher
+
 def send_push(sub_info, message, title="Brajwasi Travels"):
     """Send a single web push notification. Raises WebPushException on failure."""
-    webpush(
-        subscription_info=sub_info,
-        data=json.dumps({"title": title, "body": message, "url": "/entry"}),
-        vapid_private_key=VAPID_PRIVATE_KEY,
-        vapid_claims={"sub": VAPID_EMAIL}
-    )
+    with span("webpush", "send"):
+        response = web_pusher(sub_info).send(
+            json.dumps({"title": title, "body": message, "url": "/entry"}),
+            vapid_headers(sub_info["endpoint"]),
+            timeout=PUSH_TIMEOUT
+        )
+    if response.status_code > 202:
+        raise WebPushException(
+            f"Push failed: {response.status_code} {response.reason}\nResponse body:{response.text}",
+            response=response
+        )
+
+def _push_status(exc):
+    if not isinstance(exc, WebPushException):
+        return None
+    response = getattr(exc, "response", None)
+    if response is not None:
+        return response.status_code
+    for code in (410, 404):
+        if str(code) in str(exc):
+            return code
+    return None
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def broadcast_push(subs, message, title="Brajwasi Travels", messages=None):
+    """Send to every {car: sub_info} concurrently and prune gone (404/410) subscriptions.
+    messages ({car: text}) overrides message per car.
+
+    Returns a summary with per-car status and latency plus p50/p95 send times.
+    """
+    messages = messages or {}
+
+    def deliver(car_key):
+        started = monotonic()
+        try:
+            send_push(subs[car_key], messages.get(car_key, message), title)
+            return car_key, "sent", None, monotonic() - started
+        except Exception as e:
+            return car_key, "failed", e, monotonic() - started
+
+    results = {}
+    dead    = []
+    if subs:
+        with ThreadPoolExecutor(max_workers=min(PUSH_WORKERS, len(subs))) as pool:
+            for car_key, status, err, elapsed in pool.map(bind(deliver), list(subs)):
+                code = _push_status(err) if err else 201
+                results[car_key] = {"status": status, "code": code,
+                                    "ms": round(elapsed * 1000, 1),
+                                    "error": str(err) if err else ""}
+                if err:
+                    log("error", "push.failed", car=car_key, code=code, error=str(err))
+                    if code in (404, 410):
+                        dead.append(car_key)
+                else:
+                    log("info", "push.sent", car=car_key, ms=results[car_key]["ms"])
+
+    delete_subs(dead)
+    times = [r["ms"] for r in results.values()]
+    return {
+        "sent":    sum(1 for r in results.values() if r["status"] == "sent"),
+        "failed":  sum(1 for r in results.values() if r["status"] == "failed"),
+        "pruned":  dead,
+        "p50_ms":  percentile(times, 50),
+        "p95_ms":  percentile(times, 95),
+        "results": results,
+    }
 
 # ---------- Helpers ----------
 def today_date():
@@ -203,53 +525,907 @@ def today_date():
 def parse_time(t):
     return datetime.strptime(t, "%H:%M").time()
 
-def hours_between(start, end):
-    d1 = datetime.combine(today_date(), start)
-    d2 = datetime.combine(today_date(), end)
-    if d2 < d1:
-        d2 += timedelta(days=1)
-    return (d2 - d1).total_seconds() / 3600
-
-def calculate_ot(start, end):
-    hrs = hours_between(start, end)
-    extra = hrs - 12
-    if extra <= 0:
-        return 0
-    full_hours = int(extra)
-    fraction   = extra - full_hours
-    if fraction > 0.5:
-        return full_hours + 1
-    elif full_hours == 0:
-        return 0
-    else:
-        return full_hours
-
-def get_remarks(start, end, date):
-    night_start = start < time(5, 0)
-    night_end   = end >= time(22, 0)
-    sunday      = date.weekday() == 6
-    parts = []
-    if night_start and night_end:
-        parts.append("Night/Night")
-    elif night_start or night_end:
-        parts.append("Night")
-    if sunday:
-        parts.append("Sunday")
-    return "/".join(parts)
-
 def ordinal_suffix(n):
     if 11 <= n <= 13:
         return "th"
     return {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
 
+# ---------- Month row cache ----------
+# Each driver's B8:I38 block is read once per TTL and shared by /check-entry
+# and /get-last-closing. /entry updates the cached row in place after writing.
+# Column B holds the dates the reset wrote, i.e. which month the sheet holds.
+# Every hit also overlays the journal rows the read may not show: those not
+# flushed yet, or flushed after the read started. The journal DB is shared by
+# all workers, so entries saved through another worker (or while the read was
+# in flight) are seen straight away rather than after the TTL. A row that was
+# dead-lettered since the read makes the hit a miss: the block may still show
+# the values /entry wrote in place, and they will never reach the sheet.
+MONTH_CACHE_TTL = int(os.getenv("MONTH_CACHE_TTL", "300"))
+MONTH_FIRST_ROW = 8
+MONTH_LAST_ROW  = 38
+_month_cache      = {}
+_month_cache_lock = threading.Lock()
+
+def _month_entry(info):
+    key = (info["file_id"], info["sheet"])
+    now = monotonic()
+    with _month_cache_lock:
+        hit = _month_cache.get(key)
+    if (hit and now - hit["loaded"] < MONTH_CACHE_TTL
+            and not journal_dead_since(info["file_id"], info["sheet"], hit["read_at"])):
+        overlay = journal_rows_since(info["file_id"], info["sheet"], hit["read_at"])
+        with _month_cache_lock:
+            overlay_rows(hit["rows"], overlay)
+        return hit
+    read_at = unix_time()
+    result = sheets_execute(sheets.values().get(
+        spreadsheetId=info["file_id"],
+        range=f"{info['sheet']}!B{MONTH_FIRST_ROW}:I{MONTH_LAST_ROW}"), "get")
+    dates, values = split_date_column(result.get("values", []))
+    hit = {"rows": month_block(info["file_id"], info["sheet"], values, read_at),
+           "period": sheet_period(dates), "loaded": now, "read_at": read_at}
+    with _month_cache_lock:
+        _month_cache[key] = hit
+    return hit
+
+def get_month_rows(info):
+    """Return the sheet's C8:I38 block as 31 rows (index 0 is day 1)."""
+    return _month_entry(info)["rows"]
+
+def get_sheet_period(info):
+    """(year, month) the sheet currently holds, None if its dates are unreadable."""
+    return _month_entry(info)["period"]
+
+def month_rows_for(info, day):
+    """get_month_rows() when the sheet holds day's month, else 31 empty rows
+    (before the reset the sheet still holds last month, whose rows say
+    nothing about this one; the odometer ledger answers instead)."""
+    if period_error(get_sheet_period(info), day.year, day.month):
+        return [[] for _ in range(MONTH_LAST_ROW - MONTH_FIRST_ROW + 1)]
+    return get_month_rows(info)
+
+def split_date_column(values):
+    """B:x rows -> (date cells, rows from column C on)."""
+    return [r[0] if r else "" for r in values], [list(r[1:]) for r in values]
+
+def period_error(period, year, month):
+    """Message when (year, month) isn't the month the sheet holds, else None.
+    Rows are day + 7 whatever the month, so another month's data would land on
+    (or be read from) this month's rows."""
+    if period is None or period == (year, month):
+        return None
+    return (f"The sheet holds {datetime(*period, 1).strftime('%B %Y')}, "
+            f"not {datetime(year, month, 1).strftime('%B %Y')}.")
+
+def month_block(file_id, sheet, values, read_at):
+    """Pad a C8:I38 read (started at unix time read_at) to 31 rows and overlay
+    the journal rows it may not show."""
+    rows = [list(r) for r in values]
+    rows += [[] for _ in range(MONTH_LAST_ROW - MONTH_FIRST_ROW + 1 - len(rows))]
+    return overlay_rows(rows, journal_rows_since(file_id, sheet, read_at))
+
+def overlay_rows(rows, overlay):
+    for row, values in overlay.items():
+        rows[row - MONTH_FIRST_ROW] = ["" if v is None else str(v) for v in values]
+    return rows
+
+def fetch_sheet_blocks(file_id, sheet_names, last_col="I"):
+    """One values().batchGet for several car tabs of a spreadsheet ->
+    {sheet: (period, rows)}. last_col="C" reads only the dates and opening KM."""
+    read_at = unix_time()
+    result = sheets_execute(sheets.values().batchGet(
+        spreadsheetId=file_id,
+        ranges=[f"{s}!B{MONTH_FIRST_ROW}:{last_col}{MONTH_LAST_ROW}" for s in sheet_names]
+    ), "batchGet", priority="bulk")
+    blocks = {}
+    for sheet, vr in zip(sheet_names, result.get("valueRanges", [])):
+        dates, values = split_date_column(vr.get("values", []))
+        blocks[sheet] = (sheet_period(dates), month_block(file_id, sheet, values, read_at))
+    return blocks
+
+def fetch_fleet_month_blocks(drivers, last_col="I"):
+    """{car: (period, rows)} for every car, one batchGet per spreadsheet,
+    spreadsheets in parallel."""
+    by_file = {}
+    for info in drivers.values():
+        by_file.setdefault(info["file_id"], []).append(info["sheet"])
+    blocks = {}
+    with ThreadPoolExecutor(max_workers=min(8, len(by_file) or 1)) as pool:
+        futures = {pool.submit(bind(fetch_sheet_blocks), f, names, last_col): f
+                   for f, names in by_file.items()}
+        for fut, file_id in futures.items():
+            for sheet, block in fut.result().items():
+                blocks[(file_id, sheet)] = block
+    return {car: blocks[(info["file_id"], info["sheet"])] for car, info in drivers.items()}
+
+def fetch_fleet_month_rows(drivers, last_col="I", period=None):
+    """{car: rows} for every car. With period=(year, month), raises ValueError
+    if a sheet holds another month."""
+    blocks = fetch_fleet_month_blocks(drivers, last_col)
+    if period is not None:
+        for car, (held, _) in blocks.items():
+            wrong = period_error(held, *period)
+            if wrong:
+                raise ValueError(f"{car}: {wrong} Past months are in the archive.")
+    return {car: rows for car, (_, rows) in blocks.items()}
+
+def update_month_row(info, row, values):
+    """Write-through for a sheet row we just saved. No-op if the sheet isn't cached."""
+    key = (info["file_id"], info["sheet"])
+    with _month_cache_lock:
+        hit = _month_cache.get(key)
+        if hit:
+            hit["rows"][row - MONTH_FIRST_ROW] = ["" if v is None else str(v) for v in values]
+
+def invalidate_month_cache(info=None):
+    """Drop one sheet from the cache, or everything when info is None."""
+    with _month_cache_lock:
+        if info is None:
+            _month_cache.clear()
+        else:
+            _month_cache.pop((info["file_id"], info["sheet"]), None)
+
+def cell_filled(row, col):
+    return len(row) > col and str(row[col]).strip() != ""
+
+# ---------- Entry journal (write-behind) ----------
+# /entry appends each validated row here and answers straight away. A background
+# thread coalesces pending rows per spreadsheet and flushes them with one
+# values().batchUpdate, backing off per spreadsheet when Sheets errors. Rows
+# Sheets refuses outright (a 4xx such as a renamed tab), or that keep failing,
+# are set aside as dead letters for the admin instead of being retried forever.
+# With several gunicorn workers each runs a flusher; a worker claims a whole
+# spreadsheet's pending rows (a lease, in the DB) before writing them, so two
+# workers never write the same spreadsheet's rows out of order.
+ENTRY_JOURNAL_DB      = os.getenv("ENTRY_JOURNAL_DB", "entry_journal.db")
+JOURNAL_FLUSH_SECONDS = float(os.getenv("JOURNAL_FLUSH_SECONDS", "2"))
+JOURNAL_MAX_BACKOFF   = 300
+JOURNAL_MAX_ATTEMPTS  = 20
+JOURNAL_CLAIM_SECONDS = 300     # longer than a bulk Sheets call can take, retries included
+JOURNAL_KEEP_DAYS     = 7
+SUBMISSION_KEEP_DAYS  = 45
+_journal_wakeup  = threading.Event()
+_journal_backoff = {}   # file_id -> (failures, retry_at monotonic)
+_journal_state   = {"thread": None, "last_flush": None, "last_error": ""}
+_journal_lock    = threading.Lock()
+_journal_flush_lock = threading.Lock()
+
+def _journal_conn():
+    conn = sqlite3.connect(ENTRY_JOURNAL_DB, timeout=10)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_entry_journal():
+    with _journal_conn() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            car         TEXT NOT NULL,
+            file_id     TEXT NOT NULL,
+            sheet       TEXT NOT NULL,
+            row         INTEGER NOT NULL,
+            payload     TEXT NOT NULL,
+            created_at  REAL NOT NULL,
+            flushed_at  REAL,
+            attempts    INTEGER NOT NULL DEFAULT 0,
+            last_error  TEXT,
+            dead_at     REAL,
+            claimed_by  TEXT,
+            claim_until REAL
+        )""")
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(entries)")}
+        for name, kind in (("dead_at", "REAL"), ("claimed_by", "TEXT"), ("claim_until", "REAL")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE entries ADD COLUMN {name} {kind}")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_pending ON entries (flushed_at, file_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_sheet ON entries (file_id, sheet, id)")
+        # Last accepted submission per (car, date), so replayed offline posts dedupe.
+        conn.execute("""CREATE TABLE IF NOT EXISTS submissions (
+            car          TEXT NOT NULL,
+            entry_date   TEXT NOT NULL,
+            client_id    TEXT,
+            submitted_at REAL,
+            payload      TEXT NOT NULL,
+            received_at  REAL NOT NULL,
+            PRIMARY KEY (car, entry_date)
+        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS odometer (
+            car          TEXT NOT NULL,
+            entry_date   TEXT NOT NULL,
+            opening      INTEGER NOT NULL,
+            closing      INTEGER NOT NULL,
+            recorded_at  REAL NOT NULL,
+            flag         TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (car, entry_date)
+        ) WITHOUT ROWID""")
+        # One row per reminder run; the slot key lets one worker claim a scheduled run.
+        conn.execute("""CREATE TABLE IF NOT EXISTS reminder_runs (
+            slot        TEXT PRIMARY KEY,
+            started_at  REAL NOT NULL,
+            record      TEXT
+        )""")
+
+def _journal_insert(conn, car, info, row, values):
+    conn.execute(
+        "INSERT INTO entries (car, file_id, sheet, row, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (car, info["file_id"], info["sheet"], row, json.dumps(values), unix_time())
+    )
+
+def enqueue_entry(car, info, row, values):
+    """Durably record one C{row}:I{row} write and wake the flusher."""
+    with _journal_conn() as conn:
+        _journal_insert(conn, car, info, row, values)
+    start_entry_flusher()
+    _journal_wakeup.set()
+
+def submit_entries(car, info, items, client_id=None, submitted_at=None):
+    """Idempotent write of [(entry_date, values), ...] for one car, in one
+    transaction. Returns (statuses, flags): per item "saved", "duplicate" or
+    "stale", and the odometer ledger's regression warning ("" if none).
+
+    A replay of the submission already stored for (car, date) (same client_id,
+    or same values from a client that sends client_ids) is a duplicate. A form
+    post carries no client_id and always writes. An older submission arriving after a newer
+    one (by the client's submitted_at) is stale. Neither is written again.
+    """
+    statuses, flags, saved = [], [], []
+    conn = _journal_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for entry_date, values in items:
+            payload = json.dumps(values)
+            prev = conn.execute(
+                "SELECT client_id, submitted_at, payload FROM submissions WHERE car = ? AND entry_date = ?",
+                (car, entry_date.isoformat())
+            ).fetchone()
+            status, flag = "saved", ""
+            if prev is not None:
+                if client_id and (prev["client_id"] == client_id or prev["payload"] == payload):
+                    status = "duplicate"
+                elif submitted_at and prev["submitted_at"] and submitted_at < prev["submitted_at"]:
+                    status = "stale"
+            if status == "saved":
+                conn.execute(
+                    "INSERT OR REPLACE INTO submissions (car, entry_date, client_id, submitted_at, payload, received_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (car, entry_date.isoformat(), client_id, submitted_at, payload, unix_time())
+                )
+                _journal_insert(conn, car, info, entry_date.day + 7, values)
+                flag = _ledger_record(conn, car, entry_date, values[0], values[1])
+                saved.append((entry_date.day + 7, values))
+            statuses.append(status)
+            flags.append(flag)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if saved:
+        for row, values in saved:
+            update_month_row(info, row, values)
+        start_entry_flusher()
+        _journal_wakeup.set()
+    for (entry_date, _), flag in zip(items, flags):
+        if flag:
+            inc("odometer_regressions_total")
+            log("warning", "odometer.regression", car=car, entry_date=entry_date.isoformat(), flag=flag)
+    return statuses, flags
+
+def submit_entry(car, info, entry_date, values, client_id=None, submitted_at=None):
+    """submit_entries() for a single day -> (status, flag)."""
+    statuses, flags = submit_entries(car, info, [(entry_date, values)], client_id, submitted_at)
+    return statuses[0], flags[0]
+
+# ---------- Odometer ledger ----------
+# Opening/closing KM of every accepted entry per (car, date), in the journal
+# DB. The latest closing before any date is one primary-key lookup, whatever
+# month it was in and whether or not the sheet has been reset since. Writes
+# that run the odometer backwards are flagged (not refused: drivers correct
+# mistakes by saving over them).
+def _ledger_record(conn, car, entry_date, opening, closing):
+    """Upsert one day inside the caller's transaction; returns the regression flag."""
+    day  = entry_date.isoformat()
+    flag = ""
+    if closing < opening:
+        flag = f"Closing {closing} km is below opening {opening} km"
+    else:
+        prev = conn.execute("SELECT entry_date, closing FROM odometer WHERE car = ? AND entry_date < ? "
+                            "ORDER BY entry_date DESC LIMIT 1", (car, day)).fetchone()
+        nxt  = conn.execute("SELECT entry_date, opening FROM odometer WHERE car = ? AND entry_date > ? "
+                            "ORDER BY entry_date LIMIT 1", (car, day)).fetchone()
+        if prev is not None and opening < prev["closing"]:
+            flag = (f"Opening {opening} km is below the closing {prev['closing']} km "
+                    f"of {ledger_day_label(prev['entry_date'])}")
+        elif nxt is not None and closing > nxt["opening"]:
+            flag = (f"Closing {closing} km is above the opening {nxt['opening']} km "
+                    f"of {ledger_day_label(nxt['entry_date'])}")
+    conn.execute("INSERT OR REPLACE INTO odometer (car, entry_date, opening, closing, recorded_at, flag) "
+                 "VALUES (?, ?, ?, ?, ?, ?)", (car, day, opening, closing, unix_time(), flag))
+    return flag
+
+def ledger_day_label(iso):
+    return datetime.strptime(iso, "%Y-%m-%d").strftime("%d %b %Y")
+
+def ledger_closings(car, dates):
+    """{date: (day, closing) or None}: the ledger's latest closing strictly before
+    each date, from two indexed queries however many dates are asked for."""
+    first, last = min(dates), max(dates)
+    with _journal_conn() as conn:
+        known = conn.execute("SELECT entry_date, closing FROM odometer WHERE car = ? AND entry_date < ? "
+                             "ORDER BY entry_date DESC LIMIT 1", (car, first.isoformat())).fetchall()
+        known += conn.execute("SELECT entry_date, closing FROM odometer WHERE car = ? AND entry_date >= ? "
+                              "AND entry_date < ? ORDER BY entry_date", (car, first.isoformat(),
+                                                                          last.isoformat())).fetchall()
+    known = [(datetime.strptime(r["entry_date"], "%Y-%m-%d").date(), r["closing"]) for r in known]
+    result = {}
+    for d in dates:
+        before = [k for k in known if k[0] < d]
+        result[d] = before[-1] if before else None
+    return result
+
+def seed_odometer_ledger(docs):
+    """Add archived days the ledger doesn't have yet (entries saved before it existed)."""
+    rows = []
+    for doc in docs:
+        for i, d in enumerate(doc["day"]):
+            opening, closing = sheet_km(doc["opening"][i]), sheet_km(doc["closing"][i])
+            if opening is not None and closing is not None:
+                rows.append((doc["car"], f"{doc['year']:04d}-{doc['month']:02d}-{d:02d}",
+                             opening, closing, unix_time()))
+    with _journal_conn() as conn:
+        conn.executemany("INSERT OR IGNORE INTO odometer (car, entry_date, opening, closing, recorded_at) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+def journal_rows_since(file_id, sheet, read_at):
+    """Latest values per row for one sheet that a read started at read_at may
+    not show (not flushed yet, or flushed after it), as {row: values}."""
+    with _journal_conn() as conn:
+        rows = conn.execute(
+            "SELECT row, payload FROM entries WHERE file_id = ? AND sheet = ? AND dead_at IS NULL "
+            "AND (flushed_at IS NULL OR flushed_at >= ?) ORDER BY id",
+            (file_id, sheet, read_at)
+        ).fetchall()
+    return {r["row"]: json.loads(r["payload"]) for r in rows}
+
+def journal_dead_since(file_id, sheet, since):
+    """Whether a row for this sheet was dead-lettered at or after since. A block
+    cached before then may hold values that will never reach the sheet."""
+    with _journal_conn() as conn:
+        return conn.execute(
+            "SELECT 1 FROM entries WHERE file_id = ? AND sheet = ? AND dead_at >= ? LIMIT 1",
+            (file_id, sheet, since)
+        ).fetchone() is not None
+
+def flush_entry_journal():
+    """Push pending rows to Sheets, one batchUpdate per spreadsheet. Returns rows flushed."""
+    with _journal_flush_lock:
+        return _flush_entry_journal()
+
+def coalesce_rows(latest):
+    """{(sheet, row): values} -> batchUpdate data, one C{a}:I{b} range per run
+    of consecutive rows in a sheet (a backfilled week is one range, not seven)."""
+    runs = []
+    for sheet, row in sorted(latest):
+        run = runs[-1] if runs else None
+        if run and run["sheet"] == sheet and run["last"] == row - 1:
+            run["last"] = row
+            run["values"].append(latest[(sheet, row)])
+        else:
+            runs.append({"sheet": sheet, "first": row, "last": row, "values": [latest[(sheet, row)]]})
+    return [{"range": f"{r['sheet']}!C{r['first']}:I{r['last']}", "values": r["values"]}
+            for r in runs]
+
+def journal_error_is_final(error):
+    """A 4xx other than 429 (bad range, missing tab, no permission) won't pass on retry."""
+    return isinstance(error, HttpError) and 400 <= error.resp.status < 500 and error.resp.status != 429
+
+def _write_journal_rows(file_id, rows):
+    """One batchUpdate for rows of one spreadsheet; later submissions for the same row win."""
+    latest = {}
+    for r in rows:
+        latest[(r["sheet"], r["row"])] = json.loads(r["payload"])
+    sheets_execute(sheets.values().batchUpdate(
+        spreadsheetId=file_id,
+        body={"valueInputOption": "USER_ENTERED", "data": coalesce_rows(latest)}
+    ), "batchUpdate", priority="bulk")
+
+def _claim_journal_rows(token, skip):
+    """Lease every pending row of each spreadsheet that no other flusher holds
+    (and that isn't in skip), in one write transaction. Returns the rows."""
+    now  = unix_time()
+    conn = _journal_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        pending = conn.execute(
+            "SELECT id, file_id, sheet, row, payload, claim_until FROM entries "
+            "WHERE flushed_at IS NULL AND dead_at IS NULL ORDER BY id"
+        ).fetchall()
+        busy = {r["file_id"] for r in pending if r["claim_until"] and r["claim_until"] > now}
+        claimed = [r for r in pending if r["file_id"] not in busy and r["file_id"] not in skip]
+        last_id = {}
+        for r in claimed:
+            last_id[r["file_id"]] = r["id"]
+        conn.executemany(
+            "UPDATE entries SET claimed_by = ?, claim_until = ? "
+            "WHERE file_id = ? AND id <= ? AND flushed_at IS NULL AND dead_at IS NULL",
+            [(token, now + JOURNAL_CLAIM_SECONDS, file_id, i) for file_id, i in last_id.items()])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return claimed
+
+def _journal_mark_flushed(token, rows):
+    ids   = [r["id"] for r in rows]
+    marks = ",".join("?" * len(ids))
+    with _journal_conn() as conn:
+        conn.execute(f"UPDATE entries SET flushed_at = ?, claim_until = NULL "
+                     f"WHERE claimed_by = ? AND id IN ({marks})", [unix_time(), token] + ids)
+
+def _journal_mark_failed(token, file_id, rows, error):
+    """Count a failed attempt and release the lease; returns how many rows became dead letters."""
+    ids   = [r["id"] for r in rows]
+    marks = ",".join("?" * len(ids))
+    final = journal_error_is_final(error)
+    with _journal_conn() as conn:
+        conn.execute(
+            f"UPDATE entries SET attempts = attempts + 1, last_error = ?, claim_until = NULL, "
+            f"dead_at = CASE WHEN ? OR attempts + 1 >= ? THEN ? END WHERE claimed_by = ? AND id IN ({marks})",
+            [str(error), final, JOURNAL_MAX_ATTEMPTS, unix_time(), token] + ids)
+        dead = conn.execute(f"SELECT COUNT(*) FROM entries WHERE dead_at IS NOT NULL AND id IN ({marks})",
+                            ids).fetchone()[0]
+    if dead:
+        inc("journal_dead_letters_total", dead)
+        log("error", "journal.dead_letter", file_id=file_id, sheets=sorted({r["sheet"] for r in rows}),
+            rows=dead, final=final, error=str(error))
+    return dead
+
+def _flush_entry_journal():
+    token = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    now   = monotonic()
+    skip  = {file_id for file_id, (_, retry_at) in _journal_backoff.items() if now < retry_at}
+
+    by_file = {}
+    for r in _claim_journal_rows(token, skip):
+        by_file.setdefault(r["file_id"], []).append(r)
+
+    flushed = 0
+    for file_id, items in by_file.items():
+        failures, _ = _journal_backoff.get(file_id, (0, 0))
+        try:
+            _write_journal_rows(file_id, items)
+            results = [(items, None)]
+        except Exception as e:
+            results = [(items, e)]
+            sheet_names = sorted({r["sheet"] for r in items})
+            if journal_error_is_final(e) and len(sheet_names) > 1:
+                # One bad tab must not hold back every other car in the spreadsheet.
+                results = []
+                for sheet in sheet_names:
+                    group = [r for r in items if r["sheet"] == sheet]
+                    try:
+                        _write_journal_rows(file_id, group)
+                        results.append((group, None))
+                    except Exception as e2:
+                        results.append((group, e2))
+
+        retry = False
+        for group, error in results:
+            if error is None:
+                _journal_mark_flushed(token, group)
+                flushed += len(group)
+                continue
+            _journal_state["last_error"] = f"{file_id}: {error}"
+            if _journal_mark_failed(token, file_id, group, error) < len(group):
+                retry = True
+                log("error", "journal.flush_failed", file_id=file_id, error=str(error))
+
+        if retry:
+            failures += 1
+            delay = min(JOURNAL_MAX_BACKOFF, 2 ** failures) * random.uniform(0.5, 1.0)
+            _journal_backoff[file_id] = (failures, monotonic() + delay)
+        else:
+            _journal_backoff.pop(file_id, None)
+
+    if flushed:
+        _journal_state["last_flush"] = unix_time()
+        cutoff = unix_time() - JOURNAL_KEEP_DAYS * 86400
+        with _journal_conn() as conn:
+            conn.execute("DELETE FROM entries WHERE flushed_at IS NOT NULL AND flushed_at < ?", (cutoff,))
+            conn.execute("DELETE FROM submissions WHERE received_at < ?",
+                         (unix_time() - SUBMISSION_KEEP_DAYS * 86400,))
+    return flushed
+
+def _entry_flusher_loop():
+    while True:
+        _journal_wakeup.wait(JOURNAL_FLUSH_SECONDS)
+        _journal_wakeup.clear()
+        try:
+            flush_entry_journal()
+        except Exception as e:
+            _journal_state["last_error"] = str(e)
+            log("error", "journal.flusher_error", error=str(e))
+
+def start_entry_flusher():
+    """Start the background flusher once per process (after gunicorn forks)."""
+    with _journal_lock:
+        t = _journal_state["thread"]
+        if t is not None and t.is_alive():
+            return
+        t = threading.Thread(target=_entry_flusher_loop, name="entry-journal", daemon=True)
+        t.start()
+        _journal_state["thread"] = t
+
+def entry_journal_stats():
+    """Queue depth, flush lag and dead letters for the admin page."""
+    with _journal_conn() as conn:
+        row = conn.execute(
+            "SELECT COUNT(*) AS depth, MIN(created_at) AS oldest, MAX(attempts) AS attempts "
+            "FROM entries WHERE flushed_at IS NULL AND dead_at IS NULL"
+        ).fetchone()
+        dead = conn.execute(
+            "SELECT car, sheet, row, payload, attempts, last_error, dead_at FROM entries "
+            "WHERE dead_at IS NOT NULL ORDER BY id"
+        ).fetchall()
+    now = unix_time()
+    last_flush = _journal_state["last_flush"]
+    return {
+        "depth":      row["depth"],
+        "lag_sec":    int(now - row["oldest"]) if row["oldest"] else 0,
+        "attempts":   row["attempts"] or 0,
+        "last_flush": int(now - last_flush) if last_flush else None,
+        "last_error": _journal_state["last_error"],
+        "dead":       [{"car": r["car"], "sheet": r["sheet"], "row": r["row"], "day": r["row"] - 7,
+                        "values": json.loads(r["payload"]), "attempts": r["attempts"],
+                        "error": r["last_error"]} for r in dead],
+    }
+
+def requeue_dead_letters():
+    """Give dead letters a fresh set of attempts (after the tab or sheet is fixed)."""
+    with _journal_conn() as conn:
+        n = conn.execute("UPDATE entries SET dead_at = NULL, attempts = 0 WHERE dead_at IS NOT NULL").rowcount
+    _journal_backoff.clear()
+    start_entry_flusher()
+    _journal_wakeup.set()
+    return n
+
+def discard_dead_letters():
+    """Drop dead letters and the submissions they came from, so sending the
+    same values again writes instead of being acknowledged as a duplicate."""
+    with _journal_conn() as conn:
+        conn.execute(
+            "DELETE FROM submissions WHERE EXISTS (SELECT 1 FROM entries e WHERE e.dead_at IS NOT NULL "
+            "AND e.car = submissions.car AND e.payload = submissions.payload "
+            "AND e.row = CAST(substr(submissions.entry_date, 9, 2) AS INTEGER) + 7)")
+        return conn.execute("DELETE FROM entries WHERE dead_at IS NOT NULL").rowcount
+
+init_entry_journal()
+
+# ---------- Bills ----------
+BILL_EXPORT_PROCESSES = int(os.getenv("BILL_EXPORT_PROCESSES", "0")) or None
+
+def bill_title(year, month):
+    days_in_month = calendar.monthrange(year, month)[1]
+    month_name    = datetime(year, month, 1).strftime("%B")
+    first_ord     = f"1{ordinal_suffix(1)}"
+    last_ord      = f"{days_in_month}{ordinal_suffix(days_in_month)}"
+    return (f" Vehicle Bill for the period from "
+            f"{first_ord} {month_name} {year} "
+            f"to {last_ord} {month_name} {year}")
+
+def fleet_summary(year, month):
+    """Month totals for every car, read in bulk from the current sheets."""
+    return summarize_fleet(fetch_fleet_month_rows(DRIVERS.snapshot(), period=(year, month)), year, month)
+
+# ---------- Month reset ----------
+def reset_spreadsheet(file_id, sheet_names, title_text, date_values, days_in_month):
+    """Reset every car tab in one spreadsheet with a single batchUpdate and a single batchClear."""
+    data   = []
+    ranges = []
+    for sheet in sheet_names:
+        data.append({"range": f"{sheet}!A3", "values": [[title_text]]})
+        data.append({"range": f"{sheet}!A8:B{7 + days_in_month}", "values": date_values})
+        if days_in_month < 31:
+            ranges.append(f"{sheet}!A{8 + days_in_month}:I{7 + 31}")
+        ranges.append(f"{sheet}!C8:I{7 + days_in_month}")
+
+    sheets_execute(sheets.values().batchUpdate(
+        spreadsheetId=file_id,
+        body={"valueInputOption": "USER_ENTERED", "data": data}
+    ), "batchUpdate", priority="bulk")
+    sheets_execute(sheets.values().batchClear(
+        spreadsheetId=file_id,
+        body={"ranges": ranges}
+    ), "batchClear", priority="bulk")
+
+# ---------- Month archive ----------
+# The reset snapshots every car's month here before clearing the sheets, so
+# old months stay queryable from /archive/* without opening sheet copies.
+ARCHIVE_DIR        = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_MAX_MONTHS = 36
+
+def archive_db():
+    col = get_col()
+    return col.database if col is not None else None
+
+MONTH_ARCHIVE = MonthArchive(archive_db, ARCHIVE_DIR)
+
+def archive_fleet_month(fallback):
+    """Archive every car's current month block; returns how many car-months were stored.
+
+    The month is read from the sheet's date column, else fallback (year, month)."""
+    drivers = DRIVERS.snapshot()
+    docs = []
+    for car, (period, rows) in fetch_fleet_month_blocks(drivers).items():
+        year, month = period or fallback
+        doc = month_doc(car, drivers[car], year, month, rows)
+        if doc:
+            docs.append(doc)
+    MONTH_ARCHIVE.save(docs)
+    seed_odometer_ledger(docs)
+    return len(docs)
+
+# ---------- Missing-entry reminders ----------
+# At each REMINDER_TIMES slot (HH:MM, server local time) a daemon thread reads
+# column C for every car (one batchGet per spreadsheet) and pushes only to the
+# cars with an empty day in the last REMINDER_LOOKBACK_DAYS. The slot is
+# claimed in the journal DB first, so with several gunicorn workers only one
+# sends. `flask --app app send-reminders` runs it once, e.g. from a cron job
+# while the free-tier instance is asleep; the admin page has a button too.
+REMINDER_TIMES         = [t.strip() for t in os.getenv("REMINDER_TIMES", "").split(",") if t.strip()]
+REMINDER_LOOKBACK_DAYS = int(os.getenv("REMINDER_LOOKBACK_DAYS", "2"))
+REMINDER_KEEP_RUNS     = 100
+_reminder_state = {"thread": None}
+
+def missing_days(rows, through, lookback=REMINDER_LOOKBACK_DAYS):
+    """Days of through's month in the lookback window ending at through with no opening KM."""
+    first = max(1, through.day - lookback + 1)
+    return [d for d in range(first, through.day + 1) if not cell_filled(rows[d - 1], 0)]
+
+def find_laggards(through, lookback=REMINDER_LOOKBACK_DAYS):
+    """{car: [missing days]} for every car with a gap in the window. Cars whose
+    sheet holds another month (the reset hasn't run yet) are skipped and logged:
+    their rows say nothing about through's month."""
+    laggards, skipped = {}, []
+    for car, (held, rows) in fetch_fleet_month_blocks(DRIVERS.snapshot(), last_col="C").items():
+        if period_error(held, through.year, through.month):
+            skipped.append(car)
+            continue
+        days = missing_days(rows, through, lookback)
+        if days:
+            laggards[car] = days
+    if skipped:
+        log("warning", "reminders.wrong_month", through=through.isoformat(), cars=skipped)
+    return laggards
+
+def reminder_message(through, days):
+    names = ", ".join(through.replace(day=d).strftime("%d %b") for d in days)
+    return f"Daily log missing for {names}. Please fill it in. / कृपया एंट्री भरें।"
+
+def _claim_reminder_slot(slot):
+    with _journal_conn() as conn:
+        cur = conn.execute("INSERT OR IGNORE INTO reminder_runs (slot, started_at) VALUES (?, ?)",
+                           (slot, unix_time()))
+        return cur.rowcount == 1
+
+def send_reminders(through=None, slot=None, dry_run=False):
+    """One reminder run; returns its record, or None if another worker claimed the slot."""
+    through = through or today_date()
+    slot    = slot or "manual " + datetime.now().isoformat(sep=" ", timespec="milliseconds")
+    if not _claim_reminder_slot(slot):
+        return None
+    started = monotonic()
+    record  = {"slot": slot, "through": through.isoformat(), "cars": len(DRIVERS.keys()),
+               "missing": 0, "unsubscribed": 0, "sent": 0, "failed": 0, "pruned": 0,
+               "dry_run": dry_run, "error": ""}
+    try:
+        laggards = find_laggards(through)
+        subs     = load_subs()
+        targets  = {car: subs[car] for car in laggards if car in subs}
+        record.update(missing=len(laggards), unsubscribed=len(laggards) - len(targets),
+                      laggards=laggards)
+        if targets and not dry_run:
+            summary = broadcast_push(targets, "", title="Daily log reminder",
+                                     messages={car: reminder_message(through, laggards[car]) for car in targets})
+            record.update(sent=summary["sent"], failed=summary["failed"], pruned=len(summary["pruned"]))
+    except Exception as e:
+        record["error"] = str(e)
+    record["duration_ms"] = round((monotonic() - started) * 1000)
+    log("error" if record["error"] else "info", "reminders.run", **record)
+    with _journal_conn() as conn:
+        conn.execute("UPDATE reminder_runs SET record = ? WHERE slot = ?", (json.dumps(record), slot))
+        conn.execute("DELETE FROM reminder_runs WHERE slot NOT IN "
+                     "(SELECT slot FROM reminder_runs ORDER BY started_at DESC LIMIT ?)", (REMINDER_KEEP_RUNS,))
+    return record
+
+def recent_reminder_runs(limit=5):
+    with _journal_conn() as conn:
+        rows = conn.execute("SELECT record FROM reminder_runs WHERE record IS NOT NULL "
+                            "ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+    return [json.loads(r["record"]) for r in rows]
+
+def next_reminder_time(now):
+    candidates = []
+    for hhmm in REMINDER_TIMES:
+        at = datetime.combine(now.date(), datetime.strptime(hhmm, "%H:%M").time())
+        candidates.append(at if at > now else at + timedelta(days=1))
+    return min(candidates)
+
+def _reminder_loop():
+    while True:
+        due = next_reminder_time(datetime.now())
+        while datetime.now() < due:
+            sleep(min(300, (due - datetime.now()).total_seconds() + 0.5))
+        try:
+            send_reminders(slot=due.strftime("%Y-%m-%d %H:%M"))
+        except Exception as e:
+            log("error", "reminders.scheduler_error", error=str(e))
+
+def start_reminder_scheduler():
+    """Start the reminder thread once per process, if REMINDER_TIMES is set."""
+    if not REMINDER_TIMES or _reminder_state["thread"] is not None:
+        return
+    t = threading.Thread(target=_reminder_loop, name="reminders", daemon=True)
+    t.start()
+    _reminder_state["thread"] = t
+    log("info", "reminders.scheduled", times=REMINDER_TIMES, lookback_days=REMINDER_LOOKBACK_DAYS)
+
+start_reminder_scheduler()
+
+@app.cli.command("send-reminders")
+@click.option("--date", "through", default=None, help="Check the days up to YYYY-MM-DD (default today).")
+@click.option("--dry-run", is_flag=True, help="Find laggards without pushing.")
+def send_reminders_command(through, dry_run):
+    """Push a reminder to every driver with a missing entry."""
+    through = datetime.strptime(through, "%Y-%m-%d").date() if through else None
+    click.echo(json.dumps(send_reminders(through=through, dry_run=dry_run), indent=2, ensure_ascii=False))
+
+# ---------- Static assets ----------
+# At startup every file under static/ (except uploads) is fingerprinted and
+# precompressed in memory. Templates link to /assets/<name>.<hash>.<ext> via
+# asset_url(), which is served with a strong ETag and cached as immutable.
+ASSET_DIR          = "static"
+ASSET_MAX_AGE      = 31536000
+ASSET_COMPRESSIBLE = {".css", ".js", ".json", ".svg", ".txt", ".html", ".webmanifest"}
+ROOT_ASSETS        = ("manifest.json", "service-worker.js")
+_assets      = {}   # hashed name -> built asset
+_asset_urls  = {}   # logical static filename -> /assets/ URL
+_root_assets = {}   # manifest.json / service-worker.js, always revalidated
+
+def _build_asset(path):
+    with open(path, "rb") as f:
+        body = f.read()
+    ext   = os.path.splitext(path)[1].lower()
+    asset = {
+        "digest":   hashlib.sha256(body).hexdigest()[:12],
+        "mimetype": mimetypes.guess_type(path)[0] or "application/octet-stream",
+        "identity": body,
+    }
+    if ext in ASSET_COMPRESSIBLE:
+        gz = gzip.compress(body, 9, mtime=0)
+        br = brotli.compress(body, quality=11)
+        if len(gz) < len(body):
+            asset["gzip"] = gz
+        if len(br) < len(body):
+            asset["br"] = br
+    return asset
+
+def build_assets():
+    _assets.clear()
+    _asset_urls.clear()
+    for root, dirs, files in os.walk(ASSET_DIR):
+        dirs[:] = [d for d in dirs if d != "uploads"]
+        for name in files:
+            path  = os.path.join(root, name)
+            rel   = os.path.relpath(path, ASSET_DIR).replace(os.sep, "/")
+            asset = _build_asset(path)
+            stem, ext = os.path.splitext(rel)
+            hashed = f"{stem}.{asset['digest']}{ext}"
+            _assets[hashed]  = asset
+            _asset_urls[rel] = f"/assets/{hashed}"
+    for name in ROOT_ASSETS:
+        _root_assets[name] = _build_asset(name)
+    log("info", "assets.built", count=len(_assets))
+
+def asset_url(filename):
+    """Fingerprinted URL for a file under static/, falling back to the plain static URL."""
+    return _asset_urls.get(filename) or url_for("static", filename=filename)
+
+app.jinja_env.globals["asset_url"] = asset_url
+
+def asset_response(asset, immutable):
+    encoding = next((enc for enc in ("br", "gzip")
+                     if enc in asset and enc in request.accept_encodings), None)
+    etag = f"{asset['digest']}-{encoding}" if encoding else asset["digest"]
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = Response(asset[encoding or "identity"], mimetype=asset["mimetype"])
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+    resp.set_etag(etag)
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    if immutable:
+        resp.cache_control.max_age   = ASSET_MAX_AGE
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    return resp
+
+@app.route("/assets/<path:name>")
+def asset(name):
+    found = _assets.get(name)
+    if found is None:
+        abort(404)
+    return asset_response(found, immutable=True)
+
+build_assets()
+
 # ---------- PWA ----------
 @app.route('/manifest.json')
 def manifest():
-    return send_from_directory(os.getcwd(), 'manifest.json')
+    return asset_response(_root_assets["manifest.json"], immutable=False)
 
 @app.route('/service-worker.js')
 def sw():
-    return send_from_directory(os.getcwd(), 'service-worker.js')
+    return asset_response(_root_assets["service-worker.js"], immutable=False)
+
+@app.after_request
+def immutable_uploads(resp):
+    """Content-hashed entry photo variants never change, so let phones keep them."""
+    name = request.path.rsplit("/", 1)[-1]
+    if (resp.status_code == 200 and request.path.startswith("/static/uploads/")
+            and ENTRY_PHOTO_VARIANT_RE.match(name)):
+        resp.cache_control.public  = True
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+        resp.cache_control.no_cache = None
+    return resp
+
+# ---------- Instrumentation ----------
+# Every route is timed and every outbound call runs in a telemetry span, so a
+# request's log line says how much of it was Google, Groq, Mongo or push.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+QUIET_ROUTES  = {"/ping", "/metrics", "/assets/<path:name>"}
+
+@app.before_request
+def start_request_timer():
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    request_id = request.headers.get("X-Request-ID") or os.urandom(6).hex()
+    begin_request(request_id[:64], request.method, route)
+
+@app.after_request
+def finish_request_timer(resp):
+    ctx = end_request(resp.status_code)
+    if ctx is None:
+        return resp
+    resp.headers["X-Request-ID"] = ctx["id"]
+    if ctx["route"] not in QUIET_ROUTES:
+        log("info", "request", request_id=ctx["id"], route=ctx["route"],
+            method=ctx["method"], status=resp.status_code,
+            ms=round(ctx["elapsed"] * 1000, 1),
+            spans={name: {"calls": calls, "ms": round(total * 1000, 1)}
+                   for name, (calls, total) in ctx["spans"].items()})
+    return resp
+
+@app.route("/metrics")
+def metrics():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}" \
+            and request.args.get("token") != METRICS_TOKEN:
+        abort(403)
+    journal = entry_journal_stats()
+    set_gauge("entry_journal_depth", journal["depth"])
+    set_gauge("entry_journal_lag_seconds", journal["lag_sec"] or 0)
+    set_gauge("entry_journal_dead", len(journal["dead"]))
+    set_gauge("transcript_parse_cache_hits", parse_cache.hits)
+    set_gauge("transcript_parse_cache_misses", parse_cache.misses)
+    set_gauge("month_cache_sheets", len(_month_cache))
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 # ---------- Login ----------
 @app.route("/", methods=["GET", "POST"])
@@ -258,23 +1434,23 @@ def login():
         return redirect("/entry")
     msg = ""
     if request.method == "POST":
-        code = request.form["code"]
-        for car, info in DRIVERS.items():
-            if info["code"] == code:
-                session.permanent = True
-                session["car"] = car
-                return redirect("/entry")
+        car = DRIVERS.car_for_code(request.form["code"])
+        if car:
+            session.permanent = True
+            session["car"] = car
+            return redirect("/entry")
         msg = "Invalid code"
     return render_template("login.html", msg=msg)
 
 # ---------- Session safety ----------
 def current_driver_or_redirect():
     """Prevents 500 errors when old browser cookies contain a car not in driver.json."""
-    car = session.get("car")
-    if not car or car not in DRIVERS:
+    car  = session.get("car")
+    info = DRIVERS.get(car) if car else None
+    if info is None:
         session.clear()
         return None, None, redirect("/")
-    return car, DRIVERS[car], None
+    return car, info, None
 
 @app.route("/hard-reset")
 def hard_reset():
@@ -300,36 +1476,12 @@ def entry():
 
     if request.method == "POST":
         try:
-            opening = int(request.form["opening"])
-            closing = int(request.form["closing"])
-            start   = parse_time(request.form["start"])
-            end     = parse_time(request.form["end"])
-
-            entry_date_str = request.form.get("entry_date", "")
-            entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date() if entry_date_str else today_date()
-
-            remarks  = get_remarks(start, end, entry_date)
-            ot       = calculate_ot(start, end)
-            total_km = closing - opening
-
-            row = entry_date.day + 7
-            rng = f"{info['sheet']}!C{row}:I{row}"
-
-            values = [[
-                opening, closing, total_km,
-                start.strftime("%I:%M %p"),
-                end.strftime("%I:%M %p"),
-                ot, remarks
-            ]]
-
-            sheets.spreadsheets().values().update(
-                spreadsheetId=info["file_id"],
-                range=rng,
-                valueInputOption="USER_ENTERED",
-                body={"values": values}
-            ).execute()
-
-            msg = f"Saved successfully ✅ | Total KMs: {total_km} km"
+            entry_date, values = entry_row(request.form)
+            wrong = period_error(get_sheet_period(info), entry_date.year, entry_date.month)
+            if wrong:
+                raise ValueError(wrong)
+            _, flag = submit_entry(car, info, entry_date, values)
+            msg = f"Saved successfully ✅ | Total KMs: {values[2]} km" + (f" | ⚠️ {flag}" if flag else "")
 
         except Exception as e:
             msg = str(e)
@@ -340,6 +1492,171 @@ def entry():
                            vapid_public_key=VAPID_PUBLIC_KEY,
                            entry_photo=load_entry_photo_settings())
 
+def entry_row(data):
+    """Validate a submitted entry (form or JSON) -> (entry_date, C:I values)."""
+    opening = int(data["opening"])
+    closing = int(data["closing"])
+    start   = parse_time(data["start"])
+    end     = parse_time(data["end"])
+
+    entry_date_str = data.get("entry_date", "")
+    entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date() if entry_date_str else today_date()
+
+    remarks  = get_remarks(start, end, entry_date)
+    ot       = calculate_ot(start, end)
+    total_km = closing - opening
+
+    return entry_date, [
+        opening, closing, total_km,
+        start.strftime("%I:%M %p"),
+        end.strftime("%I:%M %p"),
+        ot, remarks
+    ]
+
+# ---------- JSON entry API ----------
+# Used by the entry page and replayed by the service worker's offline outbox.
+# Idempotent by (car, date): retries of the same submission are acknowledged
+# without writing again. 401/403 mean "keep it for the right driver", other 4xx
+# "drop it", anything else "retry".
+@app.route("/api/entry", methods=["POST"])
+def api_entry():
+    car, info, bad = current_driver_or_redirect()
+    if bad:
+        return jsonify({"ok": False, "error": "Not logged in"}), 401
+    body = request.get_json(silent=True) or {}
+    # A queued entry replayed after another driver logged in on the same phone.
+    if body.get("car") and str(body["car"]).strip().upper() != car.upper():
+        return jsonify({"ok": False, "error": f"This entry is for {body['car']}. Log in as {body['car']} to send it."}), 403
+    try:
+        entry_date, values = entry_row(body)
+        client_id    = str(body.get("client_id") or "")[:64] or None
+        submitted_at = float(body["submitted_at"]) if body.get("submitted_at") else None
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"ok": False, "error": f"Invalid entry: {e}"}), 400
+    try:
+        wrong = period_error(get_sheet_period(info), entry_date.year, entry_date.month)
+        if wrong:
+            return jsonify({"ok": False, "error": wrong}), 409
+        status, flag = submit_entry(car, info, entry_date, values, client_id, submitted_at)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+    return jsonify({"ok": True, "status": status, "entry_date": entry_date.isoformat(),
+                    "total_km": values[2], "warning": flag,
+                    "msg": f"Saved successfully ✅ | Total KMs: {values[2]} km" + (f" | ⚠️ {flag}" if flag else "")})
+
+# ---------- Bulk entry ----------
+# Several days for one car in one request: a driver catching up after days
+# without signal, or the office keying in paper logs. The batch is validated
+# as a whole (odometer continuity included) and lands in the journal in one
+# transaction; the flusher merges consecutive rows into a single range.
+BULK_MAX_DAYS = 31
+
+def sheet_km(value):
+    try:
+        return int(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+
+def check_odometer(rows, items):
+    """Lay the batch over the sheet's month and compare each filled day's
+    opening with the previous filled day's closing. Returns (errors,
+    warnings): a break between two batch days is an error, a break against a
+    day already in the sheet is a warning."""
+    batch = {d.day: (d, v) for d, v in items}
+    year, month = items[0][0].year, items[0][0].month
+    errors, warnings = [], []
+    prev = None     # (date, closing, in_batch)
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        if day in batch:
+            entry_date, values = batch[day]
+            opening, closing, mine = values[0], values[1], True
+        elif cell_filled(rows[day - 1], 1):
+            entry_date = datetime(year, month, day).date()
+            opening, closing, mine = sheet_km(rows[day - 1][0]), sheet_km(rows[day - 1][1]), False
+        else:
+            continue
+        if prev and (mine or prev[2]) and opening is not None and prev[1] is not None \
+                and opening != prev[1]:
+            problem = {"entry_date": entry_date.isoformat(),
+                       "error": f"Opening {opening} km doesn't match closing {prev[1]} km "
+                                f"on {prev[0].strftime('%d %b')}"}
+            (errors if mine and prev[2] else warnings).append(problem)
+        prev = (entry_date, closing, mine)
+    return errors, warnings
+
+@app.route("/api/entries", methods=["POST"])
+def api_entries():
+    """{entries: [{entry_date, opening, closing, start, end}, ...], client_id,
+    submitted_at}. Drivers post for their own car; the office adds the admin
+    code and a car number."""
+    body = request.get_json(silent=True) or {}
+    if body.get("code"):
+        if body["code"] != ADMIN_CODE:
+            return jsonify({"ok": False, "error": "Invalid admin code"}), 403
+        car  = str(body.get("car") or "").strip().upper()
+        info = DRIVERS.get(car)
+        if info is None:
+            return jsonify({"ok": False, "error": f"Unknown car {car!r}"}), 400
+    else:
+        car, info, bad = current_driver_or_redirect()
+        if bad:
+            return jsonify({"ok": False, "error": "Not logged in"}), 401
+
+    entries = body.get("entries")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"ok": False, "error": "entries must be a non-empty list"}), 400
+    if len(entries) > BULK_MAX_DAYS:
+        return jsonify({"ok": False, "error": f"At most {BULK_MAX_DAYS} days per request"}), 400
+
+    items, errors = [], []
+    for i, data in enumerate(entries):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError("expected an object")
+            entry_date, values = entry_row(data)
+            if values[1] < values[0]:
+                raise ValueError("closing KM is below opening KM")
+            items.append((entry_date, values))
+        except (KeyError, TypeError, ValueError) as e:
+            errors.append({"index": i, "entry_date": data.get("entry_date") if isinstance(data, dict) else None,
+                           "error": f"Invalid entry: {e}"})
+    dates = [d for d, _ in items]
+    if len(set(dates)) != len(dates):
+        errors.append({"error": "The same date appears more than once"})
+    if len({(d.year, d.month) for d in dates}) > 1:
+        errors.append({"error": "All days must be in one month (the sheet holds one month)"})
+    if errors:
+        return jsonify({"ok": False, "errors": errors}), 400
+
+    items.sort(key=lambda item: item[0])
+    try:
+        client_id    = str(body.get("client_id") or "")[:64] or None
+        submitted_at = float(body["submitted_at"]) if body.get("submitted_at") else None
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "error": f"Invalid submitted_at: {e}"}), 400
+    try:
+        wrong = period_error(get_sheet_period(info), items[0][0].year, items[0][0].month)
+        if wrong:
+            return jsonify({"ok": False, "error": wrong}), 409
+        breaks, warnings = check_odometer(get_month_rows(info), items)
+        if breaks:
+            return jsonify({"ok": False, "errors": breaks}), 400
+        statuses, flags = submit_entries(car, info, items, client_id, submitted_at)
+    except Exception as e:
+        return jsonify({"ok": False, "error": str(e)}), 503
+
+    warnings += [{"entry_date": d.isoformat(), "error": flag} for (d, _), flag in zip(items, flags) if flag]
+    log("info", "entry.bulk", car=car, days=len(items), saved=statuses.count("saved"))
+    return jsonify({
+        "ok": True,
+        "car": car,
+        "saved": statuses.count("saved"),
+        "warnings": warnings,
+        "entries": [{"entry_date": d.isoformat(), "status": status,
+                     "total_km": values[2], "ot": values[5], "remarks": values[6], "flag": flag}
+                    for (d, values), status, flag in zip(items, statuses, flags)],
+    })
+
 # ---------- Check entry ----------
 @app.route("/check-entry", methods=["POST"])
 def check_entry():
@@ -349,12 +1666,8 @@ def check_entry():
     try:
         entry_date_str = request.json.get("entry_date", "")
         entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date()
-        row = entry_date.day + 7
-        rng = f"{info['sheet']}!C{row}"
-        result = sheets.spreadsheets().values().get(
-            spreadsheetId=info["file_id"], range=rng).execute()
-        values = result.get("values", [])
-        filled = bool(values and values[0] and str(values[0][0]).strip() != "")
+        rows   = month_rows_for(info, entry_date)
+        filled = cell_filled(rows[entry_date.day - 1], 0)
         return jsonify({"filled": filled})
     except Exception as e:
         return jsonify({"filled": False, "error": str(e)})
@@ -368,59 +1681,83 @@ def get_last_closing():
     try:
         entry_date_str = request.json.get("entry_date", "")
         entry_date = datetime.strptime(entry_date_str, "%Y-%m-%d").date()
-        for i in range(1, 8):
-            prev_date = entry_date - timedelta(days=i)
-            prev_row  = prev_date.day + 7
-            rng       = f"{info['sheet']}!D{prev_row}"
-            result    = sheets.spreadsheets().values().get(
-                spreadsheetId=info["file_id"], range=rng).execute()
-            values = result.get("values", [])
-            if values and values[0] and str(values[0][0]).strip() != "":
-                return jsonify({"closing": values[0][0]})
-        return jsonify({"closing": None})
+        ledger = ledger_closings(car, [entry_date])[entry_date]
+        return jsonify({"closing": last_closing(month_rows_for(info, entry_date), entry_date, ledger=ledger)})
     except Exception as e:
         return jsonify({"closing": None, "error": str(e)})
 
-# ---------- Groq voice transcription ----------
-@app.route("/transcribe", methods=["POST"])
-def transcribe():
+def last_closing(rows, entry_date, lookback=7, ledger=None):
+    """Closing KM of the latest entry before entry_date.
+
+    Looks through the week before entry_date in the sheet's rows, stopping at
+    the 1st (the sheet only holds one month). ledger is the odometer ledger's
+    (day, closing) for the car; it wins when it is more recent, which covers
+    month boundaries, resets and gaps longer than a week. On the same day the
+    sheet wins, since it may have been corrected by hand."""
+    sheet = None
+    for i in range(1, lookback + 1):
+        prev_date = entry_date - timedelta(days=i)
+        if prev_date.month != entry_date.month:
+            break
+        prev_row = rows[prev_date.day - 1]
+        if cell_filled(prev_row, 1):
+            sheet = (prev_date, prev_row[1])
+            break
+    if ledger is not None and (sheet is None or ledger[0] > sheet[0]):
+        return str(ledger[1])
+    return sheet[1] if sheet else None
+
+# ---------- Form bootstrap ----------
+# Everything the entry form needs when the date changes, from the one cached
+# C8:I38 read: whether the day is filled, its values and the opening KM to
+# suggest. "around" also returns the neighbouring days so the page can switch
+# dates without another round trip.
+ROW_FIELDS           = ["opening", "closing", "total_km", "start", "end", "ot", "remarks"]
+BOOTSTRAP_MAX_AROUND = 7
+
+def day_state(rows, entry_date, ledger=None):
+    row    = rows[entry_date.day - 1]
+    filled = cell_filled(row, 0)
+    return {
+        "filled":  filled,
+        "row":     dict(zip(ROW_FIELDS, list(row) + [""] * (len(ROW_FIELDS) - len(row)))) if filled else None,
+        "closing": last_closing(rows, entry_date, ledger=ledger),
+    }
+
+@app.route("/entry-bootstrap", methods=["POST"])
+def entry_bootstrap():
     car, info, bad = current_driver_or_redirect()
     if bad:
         return jsonify({"error": "Not logged in"}), 401
     try:
-        import requests as req_lib
-        audio_file = request.files.get("audio")
-        if not audio_file:
-            return jsonify({"error": "No audio"}), 400
+        body       = request.json or {}
+        entry_date = datetime.strptime(body.get("entry_date", ""), "%Y-%m-%d").date()
+        around     = max(0, min(int(body.get("around", 0)), BOOTSTRAP_MAX_AROUND))
+        rows       = month_rows_for(info, entry_date)
+        dates      = [entry_date + timedelta(days=offset) for offset in range(-around, around + 1)]
+        dates      = [day for day in dates if day.month == entry_date.month]
+        ledger     = ledger_closings(car, dates)
+        days = {day.isoformat(): day_state(rows, day, ledger[day]) for day in dates}
+        return jsonify({"car": car, "date": entry_date.isoformat(), **days[entry_date.isoformat()],
+                        "days": days})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        groq_key = os.getenv("GROQ_API_KEY")
-        if not groq_key:
-            return jsonify({"error": "GROQ_API_KEY not set"}), 500
+# ---------- Groq voice transcription ----------
+GROQ_BASE_URL        = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_READ_TIMEOUT    = float(os.getenv("GROQ_READ_TIMEOUT", "30"))
+UPLOAD_CHUNK_SIZE    = 64 * 1024
+PARSE_CACHE_SIZE     = int(os.getenv("PARSE_CACHE_SIZE", "2048"))
 
-        resp = req_lib.post(
-            "https://api.groq.com/openai/v1/audio/transcriptions",
-            headers={"Authorization": f"Bearer {groq_key}"},
-            files={"file": (audio_file.filename or "audio.webm",
-                            audio_file.read(),
-                            audio_file.content_type or "audio/webm")},
-            data={"model": "whisper-large-v3-turbo",
-                  "language": "hi",
-                  "response_format": "text"}
-        )
-        if resp.status_code != 200:
-            return jsonify({"error": resp.text}), 500
+# Normalized transcript -> parsed value, filled by both the rule parser and the LLM.
+parse_cache = ParseCache(PARSE_CACHE_SIZE)
 
-        raw_text = resp.text.strip()
+# One keep-alive pool for every Groq call instead of a fresh connection per request.
+groq_session = requests.Session()
+groq_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=16))
 
-        parse_resp = req_lib.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers={"Authorization": f"Bearer {groq_key}",
-                     "Content-Type": "application/json"},
-            json={
-                "model": "llama-3.3-70b-versatile",
-                "temperature": 0,
-                "messages": [
-                    {"role": "system", "content": """You are a number and time parser for a vehicle daily log app used by Indian drivers.
+TRANSCRIPT_PARSE_PROMPT = """You are a number and time parser for a vehicle daily log app used by Indian drivers.
 Input is spoken Hindi, English, Hinglish, or mixed language, transcribed by speech-to-text. Extract ONLY the number or time being said.
 
 ═══ STEP 1: DETECT THE SPEAKING STYLE ═══
@@ -487,22 +1824,148 @@ Time examples:
 - No explanation, no units, no extra words
 - Ignore filler words: um, uh, matlab, yaani, woh, toh, haan, theek hai
 - Pure digit input (e.g. "8912") passes through unchanged
-- Try hard before giving up — prefer a best-guess number over INVALID when audio is partially clear"""},
+- Try hard before giving up — prefer a best-guess number over INVALID when audio is partially clear"""
+
+
+class MultipartStream:
+    """multipart/form-data body that reads the audio file in chunks while sending.
+
+    It has a known length, so requests sends Content-Length and streams it
+    through read() instead of building the whole body in memory.
+    """
+
+    def __init__(self, fields, file_field, filename, content_type, fileobj):
+        self.boundary = hashlib.sha1(os.urandom(16)).hexdigest()
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+            for k, v in fields.items()
+        )
+        head += (f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+                 f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n').encode()
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(f"\r\n--{self.boundary}--\r\n".encode())]
+        fileobj.seek(0, os.SEEK_END)
+        self._len = len(head) + fileobj.tell() + len(self._parts[2].getvalue())
+        fileobj.seek(0)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._len
+
+    def read(self, size=-1):
+        size = UPLOAD_CHUNK_SIZE if size is None or size < 0 else size
+        while self._parts:
+            chunk = self._parts[0].read(size)
+            if chunk:
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+    def __iter__(self):
+        return iter(lambda: self.read(UPLOAD_CHUNK_SIZE), b"")
+
+
+def groq_transcribe(groq_key, audio_file):
+    """Whisper speech-to-text. Returns the raw transcript, or raises RuntimeError."""
+    body = MultipartStream(
+        {"model": "whisper-large-v3-turbo", "language": "hi", "response_format": "text"},
+        "file", (audio_file.filename or "audio.webm").replace('"', ""),
+        audio_file.content_type or "audio/webm", audio_file.stream
+    )
+    with span("groq", "transcriptions"):
+        resp = groq_session.post(
+            f"{GROQ_BASE_URL}/audio/transcriptions",
+            headers={"Authorization": f"Bearer {groq_key}", "Content-Type": body.content_type},
+            data=body,
+            timeout=(GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT)
+        )
+    if resp.status_code != 200:
+        raise RuntimeError(resp.text)
+    return resp.text.strip()
+
+
+def groq_parse(groq_key, raw_text):
+    """Ask the LLM to turn a transcript into a number / HH:MM. None if it can't."""
+    with span("groq", "chat"):
+        resp = groq_session.post(
+            f"{GROQ_BASE_URL}/chat/completions",
+            headers={"Authorization": f"Bearer {groq_key}"},
+            json={
+                "model": "llama-3.3-70b-versatile",
+                "temperature": 0,
+                "messages": [
+                    {"role": "system", "content": TRANSCRIPT_PARSE_PROMPT},
                     {"role": "user", "content": raw_text}
                 ]
-            }
+            },
+            timeout=(GROQ_CONNECT_TIMEOUT, GROQ_READ_TIMEOUT)
         )
-        if parse_resp.status_code != 200:
-            return jsonify({"raw": raw_text, "parsed": None})
+    if resp.status_code != 200:
+        return None
+    parsed = resp.json()["choices"][0]["message"]["content"].strip()
+    return None if parsed == "INVALID" else parsed
+
+
+def parse_spoken_value(groq_key, raw_text):
+    """Cache, then the local rule parser, then the LLM. Returns (parsed, source)."""
+    key = normalize_transcript(raw_text)
+    parsed = parse_cache.get(key)
+    if parsed is not None:
+        return parsed, "cache"
+    parsed, source = parse_transcript(key), "rules"
+    if parsed is None:
+        parsed, source = groq_parse(groq_key, raw_text), "llm"
+    if parsed is not None:
+        parse_cache.put(key, parsed)
+    return parsed, source
+
+
+def timing_response(payload, timings, status=200):
+    """JSON response with per-stage durations in the body and a Server-Timing header."""
+    payload["timing"] = {k: round(v, 1) for k, v in timings.items()}
+    resp = jsonify(payload)
+    resp.status_code = status
+    resp.headers["Server-Timing"] = ", ".join(f"{k};dur={v:.1f}" for k, v in timings.items())
+    return resp
+
+
+@app.route("/transcribe", methods=["POST"])
+def transcribe():
+    car, info, bad = current_driver_or_redirect()
+    if bad:
+        return jsonify({"error": "Not logged in"}), 401
+    timings = {}
+    try:
+        # Werkzeug spools the upload to a temp file past 500 KB, so this never
+        # holds a whole recording in memory.
+        started = monotonic()
+        audio_file = request.files.get("audio")
+        timings["upload"] = (monotonic() - started) * 1000
+        if not audio_file:
+            return jsonify({"error": "No audio"}), 400
+
+        groq_key = os.getenv("GROQ_API_KEY")
+        if not groq_key:
+            return jsonify({"error": "GROQ_API_KEY not set"}), 500
+
+        started = monotonic()
+        try:
+            raw_text = groq_transcribe(groq_key, audio_file)
+        finally:
+            timings["stt"] = (monotonic() - started) * 1000
 
-        parsed = parse_resp.json()["choices"][0]["message"]["content"].strip()
-        if parsed == "INVALID":
-            parsed = None
+        started = monotonic()
+        try:
+            parsed, source = parse_spoken_value(groq_key, raw_text)
+        finally:
+            timings["parse"] = (monotonic() - started) * 1000
 
-        return jsonify({"raw": raw_text, "parsed": parsed})
+        return timing_response({"raw": raw_text, "parsed": parsed, "source": source}, timings)
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return timing_response({"error": str(e)}, timings, 500)
 
 # ---------- Push subscription ----------
 @app.route("/subscribe-push", methods=["POST"])
@@ -512,9 +1975,9 @@ def subscribe_push():
         return jsonify({"error": "Not logged in"}), 401
     sub = request.json
     if not sub or "endpoint" not in sub:
-        print(f"❌ subscribe-push: invalid data from {car}")
+        log("warning", "subs.invalid", car=car)
         return jsonify({"error": "Invalid subscription data"}), 400
-    print(f"📥 subscribe-push received for {car}")
+    log("info", "subs.received", car=car)
     save_sub(car, sub)
     return jsonify({"ok": True, "car": car})
 
@@ -523,6 +1986,7 @@ def subscribe_push():
 def admin():
     msg = ""
     cls = "error"
+    month_summary = None
 
     if request.method == "POST":
         action = request.form.get("action", "reset")
@@ -538,33 +2002,16 @@ def admin():
                 if not message:
                     raise ValueError("Message cannot be empty")
 
-                subs   = load_subs()
-                sent   = 0
-                failed = 0
-                dead   = []
-
-                targets = list(subs.keys()) if target == "all" else ([target] if target in subs else [])
-
-                for car_key in targets:
-                    try:
-                        send_push(subs[car_key], message)
-                        sent += 1
-                        print(f"✅ Push sent to {car_key}")
-                    except WebPushException as e:
-                        failed += 1
-                        err_str = str(e)
-                        print(f"❌ WebPushException for {car_key}: {err_str}")
-                        if "410" in err_str or "404" in err_str:
-                            dead.append(car_key)
-                    except Exception as e:
-                        failed += 1
-                        print(f"❌ Push error for {car_key}: {e}")
-
-                for k in dead:
-                    delete_sub(k)
+                subs    = load_subs()
+                targets = subs if target == "all" else ({target: subs[target]} if target in subs else {})
+                summary = broadcast_push(targets, message)
+                sent    = summary["sent"]
+                failed  = summary["failed"]
+                timing  = (f" (p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms)"
+                           if summary["results"] else "")
 
                 if sent > 0:
-                    msg = f"✅ Sent to {sent} driver(s)." + (f" {failed} failed." if failed else "")
+                    msg = f"✅ Sent to {sent} driver(s)." + (f" {failed} failed." if failed else "") + timing
                     cls = "success"
                 elif failed > 0:
                     msg = f"❌ Sent to 0 driver(s). {failed} failed. Ask drivers to tap 🔔 again."
@@ -575,6 +2022,29 @@ def admin():
             except Exception as e:
                 msg = f"Error: {e}"
 
+        elif action == "remind":
+            record = send_reminders()
+            if record["error"]:
+                msg = f"Error: {record['error']}"
+            elif not record["missing"]:
+                msg = "✅ Every car has filled its recent days. No reminders sent."
+                cls = "success"
+            else:
+                msg = (f"🔔 Reminded {record['sent']} of {record['missing']} driver(s) with missing entries"
+                       + (f", {record['unsubscribed']} not subscribed" if record["unsubscribed"] else "")
+                       + (f", {record['failed']} failed" if record["failed"] else "") + ".")
+                cls = "success" if record["sent"] else "error"
+
+        elif action == "journal_retry":
+            n = requeue_dead_letters()
+            msg = f"🔁 {n} failed entr{'y' if n == 1 else 'ies'} queued again for Google Sheets."
+            cls = "success"
+
+        elif action == "journal_discard":
+            n = discard_dead_letters()
+            msg = f"🗑️ Discarded {n} failed entr{'y' if n == 1 else 'ies'}."
+            cls = "success"
+
         elif action == "entry_photo":
             try:
                 mode = request.form.get("photo_mode", "hide")
@@ -593,79 +2063,175 @@ def admin():
                 msg = f"Error: {e}"
                 cls = "error"
 
+        elif action == "export":
+            try:
+                month         = int(request.form["month"])
+                year          = int(request.form["year"])
+                days_in_month = calendar.monthrange(year, month)[1]
+                drivers       = DRIVERS.snapshot()
+                fleet_rows    = fetch_fleet_month_rows(drivers, period=(year, month))
+
+                out = tempfile.TemporaryFile()
+                export_bills(fleet_rows, {car: info["sheet"] for car, info in drivers.items()},
+                             year, month, days_in_month, bill_title(year, month), out,
+                             processes=BILL_EXPORT_PROCESSES)
+                out.seek(0)
+                return send_file(out, mimetype="application/zip", as_attachment=True,
+                                 download_name=f"vehicle-bills-{year}-{month:02d}.zip")
+            except Exception as e:
+                msg = f"Error: {e}"
+
+        elif action == "summary":
+            try:
+                month_summary = fleet_summary(int(request.form["year"]), int(request.form["month"]))
+                msg = f"✅ Month summary for {len(month_summary['cars'])} car(s)."
+                cls = "success"
+            except Exception as e:
+                msg = f"Error: {e}"
+
         elif action == "reset":
             try:
                 month         = int(request.form["month"])
                 year          = int(request.form["year"])
                 days_in_month = calendar.monthrange(year, month)[1]
                 month_name    = datetime(year, month, 1).strftime("%B")
-                first_ord     = f"1{ordinal_suffix(1)}"
-                last_ord      = f"{days_in_month}{ordinal_suffix(days_in_month)}"
-                title_text    = (f" Vehicle Bill for the period from "
-                                 f"{first_ord} {month_name} {year} "
-                                 f"to {last_ord} {month_name} {year}")
-
-                with open("driver.json") as f:
-                    drivers = json.load(f)
-
-                for car, info in drivers.items():
-                    sheet   = info["sheet"]
-                    file_id = info["file_id"]
-
-                    sheets.spreadsheets().values().update(
-                        spreadsheetId=file_id, range=f"{sheet}!A3",
-                        valueInputOption="USER_ENTERED",
-                        body={"values": [[title_text]]}
-                    ).execute()
-
-                    date_values = [
-                        [day, datetime(year, month, day).strftime("%d-%b-%y")]
-                        for day in range(1, days_in_month + 1)
+                title_text    = bill_title(year, month)
+
+                # Pending journal rows belong to the outgoing month; land them
+                # before the clear so they can't overwrite the new month later.
+                flush_entry_journal()
+                journal = entry_journal_stats()
+                if journal["depth"]:
+                    raise RuntimeError(f"{journal['depth']} entries still waiting to reach Google Sheets. "
+                                       f"Try again in a minute.")
+                if journal["dead"]:
+                    raise RuntimeError(f"{len(journal['dead'])} entries could not be written to Google Sheets "
+                                       f"(see Entry Queue). Retry or discard them first.")
+
+                # Snapshot the outgoing month first; if that fails nothing is cleared.
+                archived = archive_fleet_month((year, month - 1) if month > 1 else (year - 1, 12))
+
+                date_values = [
+                    [day, datetime(year, month, day).strftime("%d-%b-%y")]
+                    for day in range(1, days_in_month + 1)
+                ]
+                by_file = {file_id: [info["sheet"] for info in cars.values()]
+                           for file_id, cars in DRIVERS.by_file().items()}
+
+                with ThreadPoolExecutor(max_workers=min(8, len(by_file) or 1)) as pool:
+                    futures = [
+                        pool.submit(bind(reset_spreadsheet), file_id, sheet_names,
+                                    title_text, date_values, days_in_month)
+                        for file_id, sheet_names in by_file.items()
                     ]
-                    sheets.spreadsheets().values().update(
-                        spreadsheetId=file_id,
-                        range=f"{sheet}!A8:B{7 + days_in_month}",
-                        valueInputOption="USER_ENTERED",
-                        body={"values": date_values}
-                    ).execute()
-
-                    if days_in_month < 31:
-                        sheets.spreadsheets().values().clear(
-                            spreadsheetId=file_id,
-                            range=f"{sheet}!A{8 + days_in_month}:I{7 + 31}"
-                        ).execute()
-
-                    sheets.spreadsheets().values().clear(
-                        spreadsheetId=file_id,
-                        range=f"{sheet}!C8:I{7 + days_in_month}"
-                    ).execute()
+                    for fut in futures:
+                        fut.result()
+
+                # The rows are blank again, so re-entering the same values must write.
+                with _journal_conn() as conn:
+                    conn.execute("DELETE FROM submissions WHERE entry_date LIKE ?",
+                                 (f"{year:04d}-{month:02d}-%",))
 
                 msg = (f"✅ All sheets updated for {month_name} {year} "
-                       f"({days_in_month} days).")
+                       f"({days_in_month} days). Archived {archived} car-month(s).")
                 cls = "success"
             except Exception as e:
                 msg = f"Error: {e}"
+            finally:
+                invalidate_month_cache()
 
     now     = datetime.now()
     subs    = load_subs()
-    drivers = list(DRIVERS.keys())
+    drivers = DRIVERS.keys()
 
     return render_template("admin.html", msg=msg, cls=cls,
                            cur_month=now.month, cur_year=now.year,
                            drivers=drivers, subs=subs,
+                           journal=entry_journal_stats(), summary=month_summary,
+                           quota=SHEETS_QUOTA.stats(), reminders=recent_reminder_runs(),
+                           reminder_times=REMINDER_TIMES,
                            entry_photo_settings=load_entry_photo_settings())
 
+@app.route("/billing-summary")
+def billing_summary():
+    if request.args.get("code") != ADMIN_CODE:
+        return jsonify({"error": "Invalid admin code"}), 403
+    now = datetime.now()
+    try:
+        year  = int(request.args.get("year", now.year))
+        month = int(request.args.get("month", now.month))
+        if not 1 <= month <= 12:
+            raise ValueError("month must be 1-12")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(fleet_summary(year, month))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def archive_range():
+    """from / to query args (YYYY-MM-DD), defaulting to the last 12 months."""
+    today = today_date()
+    start = request.args.get("from") or today.replace(year=today.year - 1, day=1).isoformat()
+    end   = request.args.get("to") or today.isoformat()
+    start = datetime.strptime(start, "%Y-%m-%d").date()
+    end   = datetime.strptime(end, "%Y-%m-%d").date()
+    if end < start:
+        raise ValueError("to is before from")
+    if (end.year - start.year) * 12 + end.month - start.month >= ARCHIVE_MAX_MONTHS:
+        raise ValueError(f"range is longer than {ARCHIVE_MAX_MONTHS} months")
+    return start, end
+
+@app.route("/archive/fleet")
+def archive_fleet():
+    """Archived per-car and fleet totals over a date range."""
+    if request.args.get("code") != ADMIN_CODE:
+        return jsonify({"error": "Invalid admin code"}), 403
+    try:
+        start, end = archive_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(MONTH_ARCHIVE.totals(start, end))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/archive/car")
+def archive_car():
+    """One car's archived days and totals over a date range."""
+    if request.args.get("code") != ADMIN_CODE:
+        return jsonify({"error": "Invalid admin code"}), 403
+    car = request.args.get("car", "").strip().upper()
+    if not car:
+        return jsonify({"error": "car is required"}), 400
+    try:
+        start, end = archive_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        report = MONTH_ARCHIVE.totals(start, end, car=car)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"car": car, "from": report["from"], "to": report["to"], "months": report["months"],
+                    "totals": report["cars"].get(car, {}), "days": report["days"]})
+
 @app.route("/clear-push-subs")
 def clear_push_subs():
     col = get_col()
     if col is not None:
         try:
-            result = col.delete_many({})
+            with span("mongo", "delete_many"):
+                result = col.delete_many({})
+            _bump_mongo_version(col)
+            forget_subs()
             return jsonify({"ok": True, "deleted": result.deleted_count})
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
     if os.path.exists(SUBS_FILE):
         os.remove(SUBS_FILE)
+        forget_subs()
         return jsonify({"ok": True, "deleted": "file_subscriptions"})
     return jsonify({"ok": True, "deleted": 0})
 
@@ -679,7 +2245,8 @@ def mongo_test():
             "uri_set": bool(MONGO_URI)
         })
     try:
-        docs = list(col.find())
+        with span("mongo", "find"):
+            docs = list(col.find())
         return jsonify({
             "mongo": "✅ connected",
             "subscription_count": len(docs),
@@ -690,15 +2257,15 @@ def mongo_test():
 
 @app.route("/debug-push")
 def debug_push():
-    subs = load_subs()
-    results = {}
-    for car_key, sub_info in subs.items():
-        try:
-            send_push(sub_info, "🔔 Test notification!", "Test")
-            results[car_key] = "✅ sent"
-        except Exception as e:
-            results[car_key] = f"❌ {e}"
-    return jsonify({"subscriptions_found": len(subs), "results": results})
+    subs    = load_subs()
+    summary = broadcast_push(subs, "🔔 Test notification!", "Test")
+    results = {
+        car_key: (f"✅ sent ({r['ms']} ms)" if r["status"] == "sent" else f"❌ {r['error']}")
+        for car_key, r in summary["results"].items()
+    }
+    return jsonify({"subscriptions_found": len(subs), "results": results,
+                    "pruned": summary["pruned"],
+                    "p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"]})
 
 @app.route("/logout")
 def logout():
@@ -0,0 +1,68 @@
+"""Benchmark the Excel bill export against synthetic fleets of growing size.
+
+    python bench/bench_bill_export.py [--sizes 10,100,400] [--processes 4]
+
+For each fleet size it exports one month of random rows for every car and
+reports wall time, bills per second and the parent process's peak Python
+allocation (tracemalloc). The peak should stay roughly flat as the fleet grows,
+because bills are built in worker processes and streamed into the zip.
+"""
+import argparse
+import calendar
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bill_export import export_bills, load_templates  # noqa: E402
+
+
+def synthetic_rows(rng, days):
+    rows, odo = [], rng.randint(10000, 90000)
+    for day in range(days):
+        if rng.random() < 0.1:
+            rows.append([])
+            continue
+        run = rng.randint(20, 400)
+        start, end = rng.randint(4, 10), rng.randint(17, 23)
+        rows.append([str(odo), str(odo + run), str(run),
+                     f"{start:02d}:00 AM", f"{end - 12:02d}:30 PM",
+                     str(max(0, end - start - 12)), "Sunday" if day % 7 == 6 else ""])
+        odo += run
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,100,400")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--year", type=int, default=2026)
+    ap.add_argument("--month", type=int, default=1)
+    args = ap.parse_args()
+
+    sheets = list(load_templates())
+    days   = calendar.monthrange(args.year, args.month)[1]
+    rng    = random.Random(7)
+    print(f"{'cars':>6} {'seconds':>8} {'bills/s':>8} {'parent peak MB':>15} {'zip MB':>7}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        fleet = {f"CAR{i:05d}": synthetic_rows(rng, days) for i in range(size)}
+        tabs  = {car: sheets[i % len(sheets)] for i, car in enumerate(fleet)}
+        tracemalloc.start()
+        started = time.perf_counter()
+        with tempfile.TemporaryFile() as out:
+            export_bills(fleet, tabs, args.year, args.month, days, "Synthetic bill", out,
+                         processes=args.processes)
+            zip_mb = out.tell() / 1e6
+        elapsed = time.perf_counter() - started
+        # The synthetic fleet itself is allocated before tracing starts.
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{size:>6} {elapsed:>8.2f} {size / elapsed:>8.1f} {peak / 1e6:>15.2f} {zip_mb:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
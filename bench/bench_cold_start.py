@@ -0,0 +1,86 @@
+"""Measure cold start: process start -> app imported -> first /ping answered.
+
+    python bench/bench_cold_start.py [--runs 5]
+
+Each run is a fresh interpreter, as on a Render free-tier wake-up. Also times
+building one Sheets request the old way (spreadsheets().values() per call) and
+through the shared SheetsClient. Needs no network: if
+GOOGLE_SERVICE_ACCOUNT_JSON isn't set a throwaway key is generated, and the
+token refresher is switched off.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.app.test_client()
+assert client.get("/ping").status_code == 200
+t2 = time.perf_counter()
+
+from googleapiclient.discovery import build
+svc = build("sheets", "v4", credentials=app.sheets.creds, static_discovery=True, cache_discovery=False)
+t3 = time.perf_counter()
+svc.spreadsheets().values().get(spreadsheetId="x", range="A1:B2")
+t4 = time.perf_counter()
+svc.spreadsheets().values().get(spreadsheetId="x", range="A1:B2")
+t5 = time.perf_counter()
+app.sheets.values().get(spreadsheetId="x", range="A1:B2")
+t6 = time.perf_counter()
+app.sheets.values().get(spreadsheetId="x", range="A1:B2")
+t7 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_ping": t2 - t1, "build": t3 - t2,
+                  "per_call_first": t4 - t3, "per_call_next": t5 - t4,
+                  "cached_first": t6 - t5, "cached_next": t7 - t6}))
+"""
+
+
+def throwaway_key():
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return json.dumps({"type": "service_account", "project_id": "bench", "private_key_id": "bench",
+                       "private_key": pem, "client_email": "bench@bench.iam.gserviceaccount.com",
+                       "client_id": "1", "token_uri": "https://oauth2.googleapis.com/token"})
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    env = dict(os.environ, SHEETS_TOKEN_REFRESH="0")
+    env.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", throwaway_key())
+
+    runs = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    def row(label, key):
+        ms = [r[key] * 1000 for r in runs]
+        print(f"{label:34s} median {statistics.median(ms):8.1f} ms   max {max(ms):8.1f} ms")
+
+    print(f"runs: {len(runs)}")
+    row("import app", "import")
+    row("first /ping after import", "first_ping")
+    row("build() from bundled discovery", "build")
+    row("values().get() rebuilt, 1st call", "per_call_first")
+    row("values().get() rebuilt, next call", "per_call_next")
+    row("SheetsClient.values().get(), 1st", "cached_first")
+    row("SheetsClient.values().get(), next", "cached_next")
+
+
+if __name__ == "__main__":
+    main()
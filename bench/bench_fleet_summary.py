@@ -0,0 +1,94 @@
+"""Benchmark the vectorized month summary against the per-row billing functions.
+
+    python bench/bench_fleet_summary.py [--vehicle-months 5000] [--seed 7]
+
+Builds a synthetic fleet of C8:I38 blocks (as Sheets returns them, with blanks,
+overnight shifts and the odd bad cell), totals it once with calculate_ot /
+get_remarks row by row and once with summarize_fleet, checks both agree, and
+prints the timings.
+"""
+import argparse
+import calendar
+import os
+import random
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from billing import calculate_ot, get_remarks, summarize_fleet  # noqa: E402
+
+
+def fake_block(rng, days):
+    rows, odo = [], rng.randint(10000, 90000)
+    for day in range(31):
+        if day >= days or rng.random() < 0.12:
+            rows.append([])
+            continue
+        start = rng.choice([rng.randint(3 * 60, 10 * 60), rng.randint(0, 23 * 60 + 59)])
+        length = rng.randint(6 * 60, 19 * 60)
+        end = (start + length) % (24 * 60)
+        km = rng.randint(20, 400)
+        fmt = lambda m: datetime(2000, 1, 1, m // 60, m % 60).strftime("%I:%M %p")
+        end_cell = fmt(end) if rng.random() > 0.01 else "??"
+        rows.append([str(odo), str(odo + km), str(km), fmt(start), end_cell, "", ""])
+        odo += km
+    return rows
+
+
+def per_row(fleet_rows, year, month):
+    days = calendar.monthrange(year, month)[1]
+    totals = {}
+    for car, rows in fleet_rows.items():
+        t = dict(days_filled=0, total_km=0, ot_hours=0, night=0, night_night=0, sunday=0)
+        for d, row in enumerate(rows[:days]):
+            if len(row) > 2 and row[2]:
+                t["total_km"] += int(row[2])
+            try:
+                start = datetime.strptime(row[3], "%I:%M %p").time()
+                end   = datetime.strptime(row[4], "%I:%M %p").time()
+            except (IndexError, ValueError):
+                continue
+            t["days_filled"] += 1
+            t["ot_hours"] += calculate_ot(start, end)
+            remarks = get_remarks(start, end, date(year, month, d + 1)).split("/")
+            t["night_night"] += remarks[:2] == ["Night", "Night"]
+            t["night"] += remarks[0] == "Night" and remarks[:2] != ["Night", "Night"]
+            t["sunday"] += "Sunday" in remarks
+        totals[car] = t
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vehicle-months", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    year, month = 2026, 3
+    days = calendar.monthrange(year, month)[1]
+    fleet = {f"UP80XX{i:05d}": fake_block(rng, days) for i in range(args.vehicle_months)}
+
+    started = time.perf_counter()
+    expected = per_row(fleet, year, month)
+    row_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    summary = summarize_fleet(fleet, year, month)
+    vec_s = time.perf_counter() - started
+
+    mismatches = [car for car in fleet if summary["cars"][car] != expected[car]]
+    for car in mismatches[:5]:
+        print(f"  mismatch {car}: {summary['cars'][car]} != {expected[car]}")
+
+    print(f"vehicle-months : {len(fleet)}")
+    print(f"per-row        : {row_s * 1000:8.1f} ms")
+    print(f"vectorized     : {vec_s * 1000:8.1f} ms  ({row_s / vec_s:.1f}x)")
+    print(f"fleet totals   : {summary['fleet']}")
+    print(f"agree          : {'yes' if not mismatches else f'NO ({len(mismatches)} cars differ)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Replay a shift-change traffic mix against the app on emulated backends.
+
+    python bench/bench_shift_change.py [--drivers 40] [--days 3] [--seed 1]
+        [--sheets-ms 150] [--mongo-ms 20] [--groq-ms 900] [--push-ms 80]
+        [--error-rate 0] [--sheets-quota 300] [--groq-rpm 0] [--think-ms 0]
+        [--save-trace trace.json | --trace trace.json]
+
+At shift change every driver opens the app at once. Each driver logs in,
+then for each of --days days: loads the form (/entry-bootstrap and
+/get-last-closing), dictates 0-4 fields (/transcribe), checks the day
+(/check-entry) and saves it (/entry). An admin client broadcasts a push
+(/admin notify) every few seconds meanwhile.
+
+The workload is generated from --seed, so two runs with the same arguments
+send the same requests in the same order per client. --save-trace writes it
+out and --trace replays a saved one, for comparing builds.
+
+Everything runs in this process: the app is imported with a throwaway
+service account key and its Sheets, MongoDB, Groq and web push clients are
+swapped for bench/emulators.py, with a generated driver.json of --drivers
+cars. Each client is a Flask test client on its own thread. The report gives
+throughput, p50/p99 per route and backend calls per request, split by
+service; "background" is the journal flusher.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, "..")
+sys.path[:0] = [ROOT, HERE]
+
+import emulators  # noqa: E402
+
+ROUTES = {"login": "/", "bootstrap": "/entry-bootstrap", "last_closing": "/get-last-closing",
+          "transcribe": "/transcribe", "check": "/check-entry", "entry": "/entry", "notify": "/admin"}
+
+
+def make_fleet(n):
+    """n cars, ten tabs per spreadsheet, with login codes 100000 + i."""
+    return {f"UP80BN{1000 + i}": {"file_id": f"fleet-{i // 10:03d}", "sheet": f"UP80BN{1000 + i}",
+                                  "code": str(100000 + i)}
+            for i in range(n)}
+
+
+def make_trace(seed, fleet, days, think_ms, notify_every_ms):
+    rng   = random.Random(seed)
+    today = date.today()
+    first = max(1, min(today.day, 28) - days + 1)
+    clients = []
+    for car, info in fleet.items():
+        ops  = [["login", {"code": info["code"]}]]
+        odo  = rng.randint(10000, 90000)
+        for d in range(first, first + days):
+            day = today.replace(day=d).isoformat()
+            km  = rng.randint(40, 400)
+            ops += [["bootstrap", {"entry_date": day, "around": 3}],
+                    ["last_closing", {"entry_date": day}]]
+            ops += [["transcribe", {}] for _ in range(rng.choice([0, 1, 2, 4]))]
+            ops += [["check", {"entry_date": day}],
+                    ["entry", {"entry_date": day, "opening": odo, "closing": odo + km,
+                               "start": f"{rng.randint(5, 9):02d}:{rng.choice([0, 15, 30, 45]):02d}",
+                               "end": f"{rng.randint(17, 23):02d}:{rng.choice([0, 15, 30, 45]):02d}"}]]
+            if think_ms:
+                ops.append(["think", {"ms": round(rng.expovariate(1 / think_ms))}])
+            odo += km
+        clients.append({"name": car, "ops": ops})
+    notify = []
+    for i in range(max(1, days * 2)):
+        notify += [["think", {"ms": notify_every_ms}], ["notify", {"message": f"Shift update {i + 1}"}]]
+    clients.append({"name": "admin", "ops": notify})
+    return {"seed": seed, "fleet": fleet, "clients": clients}
+
+
+def run_client(app, ops, results, admin_code):
+    client = app.test_client()
+    for op, params in ops:
+        if op == "think":
+            time.sleep(params["ms"] / 1000)
+            continue
+        started = time.perf_counter()
+        if op == "login":
+            r = client.post("/", data=params)
+        elif op in ("bootstrap", "last_closing", "check"):
+            r = client.post(ROUTES[op], json=params)
+        elif op == "transcribe":
+            r = client.post("/transcribe", content_type="multipart/form-data",
+                            data={"audio": (io.BytesIO(b"\0" * 24000), "voice.webm", "audio/webm")})
+        elif op == "entry":
+            r = client.post("/entry", data={k: str(v) for k, v in params.items()})
+        else:
+            r = client.post("/admin", data={"action": "notify", "code": admin_code,
+                                            "target": "all", "message": params["message"]})
+        ok = r.status_code < 400 or (op == "login" and r.status_code == 302)
+        results.append((op, time.perf_counter() - started, ok))
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] * 1000 if values else 0
+
+
+def report(results, elapsed, calls, backends):
+    errors = sum(1 for _, _, ok in results if not ok)
+    print(f"\n{len(results)} requests in {elapsed:.1f}s = {len(results) / elapsed:.1f} req/s, {errors} errors")
+    services = ["sheets", "mongo", "groq", "webpush"]
+    print(f"  {'route':13s} {'n':>5s} {'p50 ms':>8s} {'p99 ms':>8s} {'mean ms':>8s}  "
+          + "  ".join(f"{s + '/req':>10s}" for s in services))
+    ops = [op for op in ROUTES if any(o == op for o, _, _ in results)]
+    for op in ops:
+        lat = [t for o, t, _ in results if o == op]
+        per = [calls.get((s, ROUTES[op]), 0) / len(lat) for s in services]
+        print(f"  {op:13s} {len(lat):5d} {pct(lat, 50):8.0f} {pct(lat, 99):8.0f} "
+              f"{statistics.mean(lat) * 1000:8.0f}  " + "  ".join(f"{v:10.2f}" for v in per))
+    background = {s: calls.get((s, "background"), 0) for s in services}
+    print("  background    " + (", ".join(f"{s} {n}" for s, n in background.items() if n) or "-"))
+    for name, b in backends.items():
+        counts = {k: v for k, v in b.counts.items() if v}
+        print(f"  {name:8s} {counts}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--drivers", type=int, default=40)
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--sheets-ms", type=float, default=150)
+    ap.add_argument("--mongo-ms", type=float, default=20)
+    ap.add_argument("--groq-ms", type=float, default=900)
+    ap.add_argument("--push-ms", type=float, default=80)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--sheets-quota", type=int, default=300, help="reads and writes per minute")
+    ap.add_argument("--groq-rpm", type=int, default=0)
+    ap.add_argument("--think-ms", type=float, default=0)
+    ap.add_argument("--notify-every-ms", type=float, default=2000)
+    ap.add_argument("--trace")
+    ap.add_argument("--save-trace")
+    args = ap.parse_args()
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    else:
+        trace = make_trace(args.seed, make_fleet(args.drivers), args.days, args.think_ms, args.notify_every_ms)
+    if args.save_trace:
+        with open(args.save_trace, "w") as f:
+            json.dump(trace, f)
+
+    tmp = tempfile.TemporaryDirectory(prefix="shift-", ignore_cleanup_errors=True)
+    workdir = tmp.name
+    with open(os.path.join(workdir, "driver.json"), "w") as f:
+        json.dump(trace["fleet"], f)
+    os.environ.update(GOOGLE_SERVICE_ACCOUNT_JSON=emulators.service_account("https://oauth2.emulator/token"),
+                      SHEETS_TOKEN_REFRESH="0", GROQ_API_KEY="emulated",
+                      ENTRY_JOURNAL_DB=os.path.join(workdir, "journal.db"),
+                      SHEETS_READS_PER_MINUTE=str(args.sheets_quota),
+                      SHEETS_WRITES_PER_MINUTE=str(args.sheets_quota))
+    os.environ.pop("MONGO_URI", None)
+    os.chdir(ROOT)
+    import app as app_module
+    from driver_registry import DriverRegistry
+
+    backends = {
+        "sheets":  emulators.FakeSheets(args.sheets_ms, error_rate=args.error_rate, seed=args.seed,
+                                        reads_per_minute=args.sheets_quota,
+                                        writes_per_minute=args.sheets_quota),
+        "mongo":   emulators.FakeMongo(args.mongo_ms, error_rate=args.error_rate, seed=args.seed),
+        "groq":    emulators.FakeGroq(args.groq_ms, error_rate=args.error_rate, seed=args.seed,
+                                      requests_per_minute=args.groq_rpm or None),
+        "webpush": emulators.FakePush(args.push_ms, error_rate=args.error_rate, seed=args.seed),
+    }
+    emulators.install(app_module, sheets=backends["sheets"], mongo=backends["mongo"],
+                      groq=backends["groq"], push=backends["webpush"])
+    app_module.DRIVERS = DriverRegistry(os.path.join(workdir, "driver.json"))
+    subs = backends["mongo"]["subscriptions"]
+    for car in trace["fleet"]:
+        subs.docs[car] = {"_id": car, "sub": emulators.subscription(car)}
+
+    clients = trace["clients"]
+    n_ops = sum(1 for c in clients for op, _ in c["ops"] if op != "think")
+    print(f"{len(clients) - 1} drivers + admin, {n_ops} requests; latency sheets {args.sheets_ms:.0f} ms, "
+          f"mongo {args.mongo_ms:.0f} ms, groq {args.groq_ms:.0f} ms, push {args.push_ms:.0f} ms; "
+          f"error rate {args.error_rate:g}; sheets quota {args.sheets_quota}/min")
+
+    emulators.reset_calls()
+    results = []
+    threads = [threading.Thread(target=run_client, args=(app_module.app, c["ops"], results,
+                                                          app_module.ADMIN_CODE))
+               for c in clients]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    app_module.flush_entry_journal()
+
+    report(results, elapsed, emulators.calls_by_route(), backends)
+    print(f"  quota    {app_module.SHEETS_QUOTA.stats()}")
+    print(f"  journal  {app_module.entry_journal_stats()}")
+    print(f"  sheets   {verify(trace, backends['sheets'])}")
+
+
+def verify(trace, sheets):
+    """Compare the emulated sheets with the entries the trace saved."""
+    expected = {}
+    for c in trace["clients"]:
+        for op, params in c["ops"]:
+            if op == "entry":
+                expected[(c["name"], int(params["entry_date"][-2:]))] = (str(params["opening"]),
+                                                                         str(params["closing"]))
+    ok = 0
+    for (car, day), want in expected.items():
+        info = trace["fleet"][car]
+        got = sheets.dump(info["file_id"], f"{info['sheet']}!C{day + 7}:D{day + 7}")
+        ok += bool(got) and tuple(got[0]) == want
+    return f"{ok}/{len(expected)} entries match"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Benchmark the /transcribe fast path against a corpus of real-style transcripts.
+
+    python bench/bench_transcript_parser.py [--llm-ms 700] [--requests 5000]
+
+Reports how often the rule parser answers without the LLM, whether those
+answers match the expected value, the local parse cost, and the LLM time a
+shift's worth of requests would save (using --llm-ms as the LLM round trip).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from transcript_parser import normalize_transcript, parse_transcript, ParseCache  # noqa: E402
+
+# (transcript as Whisper returns it, expected value or None when the LLM should decide)
+CORPUS = [
+    ("8912", "8912"), ("45678", "45678"), ("8,912", "8912"), ("४५६७८", "45678"),
+    ("aath nau ek do", "8912"), ("do teen char paanch", "2345"), ("one two three four", "1234"),
+    ("नौ नौ एक दो", "9912"), ("nau nau nau nau nau", "99999"), ("saat saat nau nau", "7799"),
+    ("do do do", "222"), ("one two three four five", "12345"), ("Um, aath nau ek do.", "8912"),
+    ("char hazaar nau sau nabbe", "4990"), ("barah hazaar teen sau pachaas", "12350"),
+    ("nau lakh", "900000"), ("nau laakh", "900000"), ("paanch lakh bees hazaar", "520000"),
+    ("saat lakh", "700000"), ("bees hazaar", "20000"), ("teen sau", "300"), ("1 lakh", "100000"),
+    ("ek crore", "10000000"), ("चार हजार नौ सौ", "4900"),
+    ("paanch bajke pandrah minute", "05:15"), ("shaam ke saat baje", "19:00"),
+    ("raat ke das baje", "22:00"), ("subah chhe bajkar bis minute", "06:20"),
+    ("dopahar ke do baje", "14:00"), ("saade aath subah", "08:30"), ("paune nau raat", "20:45"),
+    ("sawa chhe subah", "06:15"), ("5:15 PM", "17:15"), ("6 AM", "06:00"), ("7 baje", "07:00"),
+    ("सुबह सात बजे", "07:00"), ("शाम साढ़े छह", "18:30"),
+    # Devanagari, as Whisper returns it with language "hi".
+    ("शाम के सात बजे", "19:00"), ("रात के दस बजे", "22:00"), ("दोपहर के दो बजे", "14:00"),
+    ("सात बजकर पंद्रह मिनट", "07:15"), ("साढ़े आठ सुबह", "08:30"), ("पौने नौ रात", "20:45"),
+    ("नौ नौ एक दो।", "9912"), ("आठ नौ एक दो", "8912"), ("नब्बे", "90"),
+    ("चार हज़ार नौ सौ नब्बे", "4990"), ("बारह हजार तीन सौ पचास", "12350"), ("पांच लाख", "500000"),
+    ("हाँ जी, सात सात नौ नौ", "7799"), ("तीनों", None), ("रात के दो बजे", None),
+    ("बत्तीस हजार पांच सौ", None), ("शायद आठ हजार", None),
+    # Ambiguous or outside the local grammar: these should go to the LLM.
+    ("battees hazaar paanch sau", None), ("bees paanch", None), ("raat ke do baje", None),
+    ("haan woh reading thi shayad aath hazaar", None), ("theek hai", None), ("", None),
+    ("7.30", None), ("7 30", None), ("12.45", None), ("saat 30", None),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--llm-ms", type=float, default=700.0, help="assumed LLM round trip")
+    ap.add_argument("--requests", type=int, default=5000, help="replayed /transcribe calls")
+    args = ap.parse_args()
+
+    resolved = correct = 0
+    started = time.perf_counter()
+    for text, expected in CORPUS:
+        got = parse_transcript(normalize_transcript(text))
+        if got is not None:
+            resolved += 1
+            correct += got == expected
+            if got != expected:
+                print(f"  mismatch: {text!r} -> {got!r} (expected {expected!r})")
+    per_item_us = (time.perf_counter() - started) / len(CORPUS) * 1e6
+
+    # Replay with skew: drivers repeat the same few readings and times.
+    rng   = random.Random(42)
+    cache = ParseCache(1024)
+    weights = [1 / (i + 1) for i in range(len(CORPUS))]
+    llm_calls = 0
+    for text, _ in rng.choices(CORPUS, weights=weights, k=args.requests):
+        key = normalize_transcript(text)
+        if cache.get(key) is not None:
+            continue
+        value = parse_transcript(key)
+        if value is None:
+            llm_calls += 1
+            value = "llm"
+        cache.put(key, value)
+
+    print(f"corpus:            {len(CORPUS)} transcripts")
+    print(f"rule parser:       {resolved}/{len(CORPUS)} answered locally "
+          f"({resolved / len(CORPUS):.0%}), {correct}/{resolved} correct")
+    print(f"local parse cost:  {per_item_us:.1f} us per transcript")
+    print(f"replay:            {args.requests} requests, cache hit rate "
+          f"{cache.hits / args.requests:.1%}, {llm_calls} LLM calls")
+    saved = (args.requests - llm_calls) * args.llm_ms / 1000
+    print(f"LLM time saved:    ~{saved:.0f} s at {args.llm_ms:.0f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
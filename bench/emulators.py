@@ -0,0 +1,513 @@
+"""In-process stand-ins for the app's backends: Sheets, MongoDB, Groq and web push.
+
+    import emulators
+    sheets = emulators.FakeSheets(latency_ms=150, reads_per_minute=300)
+    emulators.install(app, sheets=sheets, mongo=emulators.FakeMongo(latency_ms=20),
+                      groq=emulators.FakeGroq(latency_ms=900), push=emulators.FakePush(latency_ms=80))
+
+Each fake sleeps for a configurable latency (with jitter) and fails at a
+configurable rate, the way its real backend does:
+
+- FakeSheets keeps cell values per spreadsheet and tab, with A1 range semantics
+  for values().get/update/clear and their batch forms: trailing blanks are
+  trimmed from reads, writes bigger than their range are rejected, and values
+  come back as strings. Optional per-minute read/write quotas answer 429 with
+  Retry-After, like the real per-project quota. Errors are HttpError 503.
+- FakeMongo holds documents in dicts and supports the calls app.py makes
+  (find, find_one, update_one with $set/$inc and upsert, delete_many,
+  create_index, bulk_write of ReplaceOne).
+- FakeGroq answers /audio/transcriptions and /chat/completions. It reads the
+  whole upload, and can rate-limit with 429 like Groq's free tier.
+- FakePush accepts pushes, and answers 410 for endpoints marked gone.
+
+Every call is counted against the route of the request that made it
+(telemetry.current_route(); flusher threads count as "background"), so a
+benchmark can report backend calls per request.
+
+Run directly, it serves the app on the fakes for trying it out offline.
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter, deque
+from time import monotonic, sleep
+
+import httplib2
+from googleapiclient.errors import HttpError
+from pymongo.errors import AutoReconnect
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from telemetry import current_route  # noqa: E402
+
+_calls_lock = threading.Lock()
+_calls      = Counter()     # (service, route) -> calls
+
+
+def calls_by_route():
+    """{(service, route): calls} since the last reset_calls()."""
+    with _calls_lock:
+        return dict(_calls)
+
+
+def reset_calls():
+    with _calls_lock:
+        _calls.clear()
+
+
+class Backend:
+    """Latency, jitter and error rate shared by the fakes."""
+    service = ""
+
+    def __init__(self, latency_ms=0.0, jitter=0.25, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter     = jitter
+        self.error_rate = error_rate
+        self._rng       = random.Random(seed)
+        self._rng_lock  = threading.Lock()
+        self.counts     = Counter()
+
+    def random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def choice(self, seq):
+        with self._rng_lock:
+            return self._rng.choice(seq)
+
+    def _call(self, op, latency_ms=None):
+        """Count the call, wait out the latency and return True if it should fail."""
+        with _calls_lock:
+            _calls[(self.service, current_route())] += 1
+            self.counts[op] += 1
+        latency_ms = self.latency_ms if latency_ms is None else latency_ms
+        if latency_ms:
+            spread = 1 + self.jitter * (2 * self.random() - 1)
+            sleep(max(0.0, latency_ms * spread) / 1000)
+        if self.error_rate and self.random() < self.error_rate:
+            with _calls_lock:
+                self.counts["errors"] += 1
+            return True
+        return False
+
+
+class FakeResponse:
+    def __init__(self, status_code, body="", reason=""):
+        self.status_code = status_code
+        self.reason  = reason or {200: "OK", 201: "Created", 410: "Gone", 429: "Too Many Requests",
+                                  503: "Service Unavailable"}.get(status_code, "")
+        self.text    = body if isinstance(body, str) else json.dumps(body)
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+# ---------- Sheets ----------
+A1 = re.compile(r"^([A-Z]+)?(\d+)?(?::([A-Z]+)?(\d+)?)?$")
+MAX_ROWS = 1000
+MAX_COLS = 26
+
+
+def column_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parse_range(a1):
+    """'Tab'!C8:I38 -> (tab, first_row, first_col, last_row, last_col), 1-based and inclusive."""
+    sheet, _, cells = a1.rpartition("!")
+    sheet = sheet.strip("'") or "Sheet1"
+    m = A1.match(cells.upper())
+    if not m or not cells:
+        raise HttpError(httplib2.Response({"status": "400"}),
+                        f'{{"error": "Unable to parse range: {a1}"}}'.encode())
+    c1, r1, c2, r2 = m.groups()
+    if ":" not in cells:
+        c2, r2 = c1, r1
+    return (sheet, int(r1 or 1), column_number(c1) if c1 else 1,
+            int(r2 or MAX_ROWS), column_number(c2) if c2 else MAX_COLS)
+
+
+class FakeRequest:
+    def __init__(self, backend, op, fn):
+        self.backend, self.op, self.fn = backend, op, fn
+
+    def execute(self, http=None, num_retries=0):
+        return self.backend.execute(self.op, self.fn)
+
+
+class FakeValues:
+    def __init__(self, backend):
+        self.b = backend
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(self.b, "get", lambda: self.b.read(spreadsheetId, range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return FakeRequest(self.b, "batchGet", lambda: {
+            "spreadsheetId": spreadsheetId,
+            "valueRanges": [self.b.read(spreadsheetId, r) for r in ranges]})
+
+    def update(self, spreadsheetId, range, body, valueInputOption="RAW", **kwargs):
+        return FakeRequest(self.b, "update", lambda: self.b.write(spreadsheetId, range, body["values"]))
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            results = [self.b.write(spreadsheetId, d["range"], d["values"]) for d in body["data"]]
+            return {"spreadsheetId": spreadsheetId, "responses": results,
+                    "totalUpdatedCells": sum(r["updatedCells"] for r in results)}
+        return FakeRequest(self.b, "batchUpdate", run)
+
+    def clear(self, spreadsheetId, range, body=None):
+        return FakeRequest(self.b, "clear", lambda: self.b.clear(spreadsheetId, range))
+
+    def batchClear(self, spreadsheetId, body):
+        return FakeRequest(self.b, "batchClear", lambda: {
+            "spreadsheetId": spreadsheetId,
+            "clearedRanges": [self.b.clear(spreadsheetId, r)["clearedRange"] for r in body["ranges"]]})
+
+
+class FakeSheets(Backend):
+    """Drop-in for SheetsClient: values(), http(), stats()."""
+    service = "sheets"
+    READ_OPS = {"get", "batchGet"}
+
+    def __init__(self, latency_ms=150, jitter=0.25, error_rate=0.0, seed=0,
+                 reads_per_minute=None, writes_per_minute=None):
+        super().__init__(latency_ms, jitter, error_rate, seed)
+        self.limits  = {"read": reads_per_minute, "write": writes_per_minute}
+        self._window = {"read": deque(), "write": deque()}
+        self._cells  = {}       # (spreadsheet, tab) -> {(row, col): str}
+        self._lock   = threading.Lock()
+        self._values = FakeValues(self)
+
+    def values(self):
+        return self._values
+
+    def spreadsheets(self):
+        return self
+
+    def http(self):
+        return None
+
+    def stats(self):
+        return {"built": True, "http_clients": 0, "token_ttl_sec": None, "calls": dict(self.counts)}
+
+    def _over_quota(self, kind):
+        limit = self.limits[kind]
+        if not limit:
+            return 0
+        now = monotonic()
+        with self._lock:
+            window = self._window[kind]
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= limit:
+                self.counts["quota_429"] += 1
+                return 60 - (now - window[0])
+            window.append(now)
+        return 0
+
+    def execute(self, op, fn):
+        kind = "read" if op in self.READ_OPS else "write"
+        wait = self._over_quota(kind)
+        failed = self._call(op)
+        if wait:
+            raise HttpError(httplib2.Response({"status": "429", "retry-after": str(int(wait) + 1)}),
+                            b'{"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}')
+        if failed:
+            raise HttpError(httplib2.Response({"status": "503"}),
+                            b'{"error": {"code": 503, "status": "UNAVAILABLE"}}')
+        with self._lock:
+            return fn()
+
+    # Called with self._lock held.
+    def read(self, spreadsheet, a1):
+        sheet, r1, c1, r2, c2 = parse_range(a1)
+        cells = self._cells.get((spreadsheet, sheet), {})
+        rows = []
+        for r in range(r1, min(r2, MAX_ROWS) + 1):
+            row = [cells.get((r, c), "") for c in range(c1, min(c2, MAX_COLS) + 1)]
+            while row and row[-1] == "":
+                row.pop()
+            rows.append(row)
+        while rows and not rows[-1]:
+            rows.pop()
+        out = {"range": a1, "majorDimension": "ROWS"}
+        if rows:
+            out["values"] = rows
+        return out
+
+    def write(self, spreadsheet, a1, values):
+        sheet, r1, c1, r2, c2 = parse_range(a1)
+        if len(values) > r2 - r1 + 1 or any(len(row) > c2 - c1 + 1 for row in values):
+            raise HttpError(httplib2.Response({"status": "400"}),
+                            f'{{"error": "Requested writing within range [{a1}], but tried '
+                            f'writing beyond it"}}'.encode())
+        cells = self._cells.setdefault((spreadsheet, sheet), {})
+        updated = 0
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                if value is None:
+                    continue
+                if value == "":
+                    cells.pop((r1 + i, c1 + j), None)
+                else:
+                    cells[(r1 + i, c1 + j)] = str(value)
+                updated += 1
+        return {"updatedRange": a1, "updatedRows": len(values), "updatedCells": updated}
+
+    def clear(self, spreadsheet, a1):
+        sheet, r1, c1, r2, c2 = parse_range(a1)
+        cells = self._cells.get((spreadsheet, sheet), {})
+        for key in [k for k in cells if r1 <= k[0] <= r2 and c1 <= k[1] <= c2]:
+            del cells[key]
+        return {"clearedRange": a1}
+
+    def dump(self, spreadsheet, a1):
+        """Read a range without latency, quota or counting (for checks)."""
+        with self._lock:
+            return self.read(spreadsheet, a1).get("values", [])
+
+
+# ---------- MongoDB ----------
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+
+class FakeCollection:
+    def __init__(self, backend, name):
+        self.b, self.name = backend, name
+        self.docs = {}
+
+    @property
+    def database(self):
+        return self.b
+
+    def _op(self, op):
+        if self.b._call(op):
+            raise AutoReconnect("emulated connection reset")
+
+    def _matches(self, doc, filt):
+        for key, cond in (filt or {}).items():
+            value = doc.get(key)
+            if isinstance(cond, dict) and "$in" in cond:
+                if value not in cond["$in"]:
+                    return False
+            elif value != cond:
+                return False
+        return True
+
+    def find(self, filt=None):
+        self._op("find")
+        with self.b.lock:
+            return [dict(d) for d in self.docs.values() if self._matches(d, filt)]
+
+    def find_one(self, filt=None):
+        self._op("find_one")
+        with self.b.lock:
+            return next((dict(d) for d in self.docs.values() if self._matches(d, filt)), None)
+
+    def update_one(self, filt, update, upsert=False):
+        self._op("update_one")
+        with self.b.lock:
+            doc = next((d for d in self.docs.values() if self._matches(d, filt)), None)
+            if doc is None:
+                if not upsert:
+                    return
+                doc = {k: v for k, v in filt.items() if not isinstance(v, dict)}
+                self.docs[doc["_id"]] = doc
+            doc.update(update.get("$set", {}))
+            for k, v in update.get("$inc", {}).items():
+                doc[k] = doc.get(k, 0) + v
+
+    def insert_one(self, doc):
+        self._op("insert_one")
+        with self.b.lock:
+            self.docs[doc["_id"]] = dict(doc)
+
+    def create_index(self, keys, **kwargs):
+        self._op("create_index")
+        return "_".join(f"{k}_{d}" for k, d in keys)
+
+    def bulk_write(self, requests, ordered=True):
+        """ReplaceOne requests, as one round trip."""
+        self._op("bulk_write")
+        with self.b.lock:
+            for req in requests:
+                key = req._filter["_id"]
+                if key in self.docs or req._upsert:
+                    self.docs[key] = dict(req._doc)
+
+    def delete_many(self, filt):
+        self._op("delete_many")
+        with self.b.lock:
+            gone = [k for k, d in self.docs.items() if self._matches(d, filt)]
+            for k in gone:
+                del self.docs[k]
+        return DeleteResult(len(gone))
+
+
+class FakeMongo(Backend):
+    """A database of FakeCollections; install() uses its "subscriptions" collection."""
+    service = "mongo"
+
+    def __init__(self, latency_ms=20, jitter=0.25, error_rate=0.0, seed=0):
+        super().__init__(latency_ms, jitter, error_rate, seed)
+        self.lock = threading.Lock()
+        self.collections = {}
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = FakeCollection(self, name)
+            return self.collections[name]
+
+
+# ---------- Groq ----------
+# (transcript, what the LLM answers for it). Transcripts the rule parser
+# understands never reach /chat/completions.
+TRANSCRIPTS = [
+    ("aath nau ek do", "8912"),
+    ("char hazaar nau sau nabbe", "4990"),
+    ("shaam ke saat baje", "19:00"),
+    ("subah chhe bajkar bis minute", "06:20"),
+    ("umm woh matlab paanch do saat", "527"),
+    ("gaadi ka meter teen ek nau", "319"),
+]
+
+
+class FakeGroq(Backend):
+    """Drop-in for app.groq_session (only post() is used)."""
+    service = "groq"
+
+    def __init__(self, latency_ms=900, jitter=0.25, error_rate=0.0, seed=0,
+                 requests_per_minute=None, chat_ms=None, transcripts=TRANSCRIPTS):
+        super().__init__(latency_ms, jitter, error_rate, seed)
+        self.chat_ms = latency_ms / 3 if chat_ms is None else chat_ms
+        self.requests_per_minute = requests_per_minute
+        self.transcripts = list(transcripts)
+        self.answers = dict(transcripts)
+        self._window = deque()
+        self._lock = threading.Lock()
+
+    def _limited(self):
+        if not self.requests_per_minute:
+            return False
+        now = monotonic()
+        with self._lock:
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            if len(self._window) >= self.requests_per_minute:
+                self.counts["rate_limited"] += 1
+                return True
+            self._window.append(now)
+        return False
+
+    def post(self, url, headers=None, data=None, json=None, timeout=None):
+        if data is not None and hasattr(data, "read"):
+            while data.read(64 * 1024):
+                pass
+        chat    = url.endswith("/chat/completions")
+        limited = self._limited()
+        failed  = self._call("chat" if chat else "transcriptions", self.chat_ms if chat else None)
+        if limited:
+            return FakeResponse(429, {"error": {"message": "Rate limit reached"}})
+        if failed:
+            return FakeResponse(503, {"error": {"message": "Service unavailable"}})
+        if chat:
+            text = json["messages"][-1]["content"]
+            return FakeResponse(200, {"choices": [{"message": {"content": self.answers.get(text, "INVALID")}}]})
+        if url.endswith("/audio/transcriptions"):
+            return FakeResponse(200, self.choice(self.transcripts)[0] + "\n")
+        return FakeResponse(404, {"error": {"message": "Unknown endpoint"}})
+
+
+# ---------- Web push ----------
+class FakePusher:
+    def __init__(self, backend, endpoint):
+        self.b, self.endpoint = backend, endpoint
+
+    def send(self, data, headers=None, timeout=None, **kwargs):
+        failed = self.b._call("send")
+        if self.endpoint in self.b.gone:
+            return FakeResponse(410, "push subscription has unsubscribed or expired")
+        if failed:
+            return FakeResponse(503, "")
+        return FakeResponse(201, "")
+
+
+class FakePush(Backend):
+    """Drop-in for app.web_pusher(sub_info). Endpoints in `gone` answer 410."""
+    service = "webpush"
+
+    def __init__(self, latency_ms=80, jitter=0.25, error_rate=0.0, seed=0, gone=()):
+        super().__init__(latency_ms, jitter, error_rate, seed)
+        self.gone = set(gone)
+
+    def pusher(self, sub_info):
+        return FakePusher(self, sub_info.get("endpoint", ""))
+
+
+def subscription(car):
+    """A web push subscription for car, pointing at FakePush."""
+    return {"endpoint": f"https://push.emulator/{car}",
+            "keys": {"p256dh": "BEmulatedKey", "auth": "emulated"}}
+
+
+# ---------- Wiring ----------
+def service_account(token_uri):
+    """Service account JSON with a throwaway key; app.py won't import without one."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return json.dumps({"type": "service_account", "project_id": "emulator", "private_key_id": "emulator",
+                       "private_key": pem, "client_email": "emulator@emulator.iam.gserviceaccount.com",
+                       "client_id": "1", "token_uri": token_uri})
+
+
+def install(app_module, sheets=None, mongo=None, groq=None, push=None):
+    """Point an imported app module at the given fakes (None leaves a backend alone)."""
+    if sheets is not None:
+        app_module.sheets = sheets
+        app_module.invalidate_month_cache()
+    if mongo is not None:
+        app_module._mongo_col = mongo["subscriptions"]
+        app_module.forget_subs()
+    if groq is not None:
+        app_module.groq_session = groq
+    if push is not None:
+        app_module.web_pusher = push.pusher
+
+
+def main():
+    """Run the app's dev server on the fakes: python bench/emulators.py [--port 5000]."""
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=5000)
+    ap.add_argument("--sheets-ms", type=float, default=150)
+    ap.add_argument("--groq-ms", type=float, default=900)
+    args = ap.parse_args()
+
+    os.chdir(ROOT)
+    os.environ.setdefault("GOOGLE_SERVICE_ACCOUNT_JSON", service_account("https://oauth2.emulator/token"))
+    os.environ.update(SHEETS_TOKEN_REFRESH="0", GROQ_API_KEY=os.getenv("GROQ_API_KEY") or "emulated")
+    os.environ.pop("MONGO_URI", None)
+    import app as app_module
+    install(app_module, sheets=FakeSheets(args.sheets_ms), mongo=FakeMongo(),
+            groq=FakeGroq(args.groq_ms), push=FakePush())
+    app_module.app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Load-test the app under gunicorn against local stand-ins for Google and Groq.
+
+    python bench/loadtest.py [--modes sync,gthread] [--concurrency 24] [--duration 20]
+                             [--sheets-ms 150] [--groq-ms 1200]
+
+A stand-in HTTP server answers the OAuth token, Sheets values and Groq calls
+after a fixed delay. For each mode gunicorn is started against it:
+
+    sync     gunicorn app:app, one sync worker       (the old start command)
+    gthread  gunicorn -c gunicorn.conf.py app:app    (threaded workers)
+
+Client threads log in as the drivers in driver.json and loop over a mix of
+/check-entry, /entry and /transcribe. The script prints requests/s and the
+p50/p95/p99 latency per route. MONTH_CACHE_TTL=0 sends every read to the
+stand-in, so this is the worst case for Sheets.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MIX  = [("check", 60), ("entry", 25), ("transcribe", 15)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """OAuth token endpoint, Sheets values API and Groq, each after a fixed delay."""
+    sheets_ms = 150
+    groq_ms   = 1200
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, body, delay_ms=0):
+        time.sleep(delay_ms / 1000)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.endswith("/values:batchGet"):
+            ranges = parse_qs(url.query).get("ranges", [])
+            return self._json({"valueRanges": [{"range": r} for r in ranges]}, self.sheets_ms)
+        if "/values/" in url.path:
+            return self._json({"range": url.path.rsplit("/", 1)[-1]}, self.sheets_ms)
+        self.send_error(404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        path = urlparse(self.path).path
+        if path == "/token":
+            return self._json({"access_token": "standin", "expires_in": 3600, "token_type": "Bearer"})
+        if path.endswith(("/values:batchUpdate", "/values:batchClear")):
+            return self._json({}, self.sheets_ms)
+        if path.endswith("/audio/transcriptions"):
+            return self._json({"text": "aath nau ek do"}, self.groq_ms)
+        if path.endswith("/chat/completions"):
+            return self._json({"choices": [{"message": {"content": "8912"}}]}, self.groq_ms)
+        self.send_error(404)
+
+
+def service_account(token_uri):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return json.dumps({"type": "service_account", "project_id": "load", "private_key_id": "load",
+                       "private_key": pem, "client_email": "load@load.iam.gserviceaccount.com",
+                       "client_id": "1", "token_uri": token_uri})
+
+
+def start_app(mode, port, standin, workdir):
+    env = dict(os.environ,
+               PORT=str(port),
+               GOOGLE_SERVICE_ACCOUNT_JSON=service_account(f"{standin}/token"),
+               SHEETS_API_ENDPOINT=f"{standin}/",
+               GROQ_BASE_URL=f"{standin}/openai/v1",
+               GROQ_API_KEY="standin",
+               MONTH_CACHE_TTL="0",
+               # Every request should reach the stand-in: the quota governor
+               # would otherwise pace both modes to the same 60 calls/min.
+               SHEETS_READS_PER_MINUTE="100000",
+               SHEETS_WRITES_PER_MINUTE="100000",
+               ENTRY_JOURNAL_DB=os.path.join(workdir, f"{mode}.db"))
+    env.pop("MONGO_URI", None)
+    if mode == "sync":
+        # gunicorn reads ./gunicorn.conf.py by default, so pin the old defaults explicitly.
+        cmd = ["gunicorn", "app:app", "--bind", f"127.0.0.1:{port}",
+               "--worker-class", "sync", "--workers", "1", "--threads", "1", "--timeout", "30"]
+    else:
+        cmd = ["gunicorn", "-c", "gunicorn.conf.py", "app:app", "--bind", f"127.0.0.1:{port}"]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if requests.get(f"{base}/ping", timeout=1).ok:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode}: gunicorn didn't come up")
+
+
+def driver(base, code, stop, results, rng):
+    s = requests.Session()
+    s.post(f"{base}/", data={"code": code}, allow_redirects=False, timeout=60)
+    ops, weights = zip(*MIX)
+    today = date.today()
+    while not stop.is_set():
+        op = rng.choices(ops, weights)[0]
+        day = today.replace(day=rng.randint(1, 28)).isoformat()
+        started = time.perf_counter()
+        try:
+            if op == "check":
+                r = s.post(f"{base}/check-entry", json={"entry_date": day}, timeout=60)
+            elif op == "entry":
+                opening = rng.randint(1000, 90000)
+                r = s.post(f"{base}/entry", data={"opening": opening, "closing": opening + 120,
+                                                  "start": "08:00", "end": "20:00",
+                                                  "entry_date": day}, timeout=60)
+            else:
+                r = s.post(f"{base}/transcribe", files={"audio": ("a.webm", b"\0" * 4000, "audio/webm")},
+                           timeout=60)
+            ok = r.status_code < 500
+        except requests.RequestException:
+            ok = False
+        results.append((op, time.perf_counter() - started, ok))
+
+
+def run(mode, args, standin, workdir, codes):
+    proc, base = start_app(mode, free_port(), standin, workdir)
+    try:
+        stop, results = threading.Event(), []
+        threads = [threading.Thread(target=driver, args=(base, codes[i % len(codes)], stop, results,
+                                                         random.Random(i)))
+                   for i in range(args.concurrency)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.duration)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return results, elapsed
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))] * 1000 if values else 0
+
+
+def report(mode, results, elapsed):
+    errors = sum(1 for _, _, ok in results if not ok)
+    print(f"\n{mode}: {len(results)} requests in {elapsed:.1f}s = {len(results) / elapsed:.1f} req/s, "
+          f"{errors} errors")
+    for op in [None] + [op for op, _ in MIX]:
+        lat = [t for o, t, _ in results if op is None or o == op]
+        print(f"  {op or 'all':11s} n={len(lat):5d}  p50 {pct(lat, 50):7.0f} ms  "
+              f"p95 {pct(lat, 95):7.0f} ms  p99 {pct(lat, 99):7.0f} ms"
+              + (f"  mean {statistics.mean(lat) * 1000:7.0f} ms" if lat else ""))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--modes", default="sync,gthread")
+    ap.add_argument("--concurrency", type=int, default=24)
+    ap.add_argument("--duration", type=float, default=20)
+    ap.add_argument("--sheets-ms", type=float, default=150)
+    ap.add_argument("--groq-ms", type=float, default=1200)
+    args = ap.parse_args()
+
+    StandIn.sheets_ms, StandIn.groq_ms = args.sheets_ms, args.groq_ms
+    server = ThreadingHTTPServer(("127.0.0.1", free_port()), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    standin = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with open(os.path.join(ROOT, "driver.json")) as f:
+        codes = [info["code"] for info in json.load(f).values()]
+
+    print(f"stand-in latency: sheets {args.sheets_ms:.0f} ms, groq {args.groq_ms:.0f} ms; "
+          f"{args.concurrency} clients for {args.duration:.0f}s per mode")
+    with tempfile.TemporaryDirectory() as workdir:
+        for mode in args.modes.split(","):
+            results, elapsed = run(mode, args, standin, workdir, codes)
+            report(mode, results, elapsed)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Month-end vehicle bill export from the excel/ templates.
+
+Each template sheet is named after the car's sheet tab and holds the bill layout:
+header rows 1-7, one row per day from row 8, then the totals/payment footer.
+The footer's Extra Kms, Sunday and Night charge counts come from
+billing.summarize_fleet, so the bill charges what the month summary reports.
+A bill is rebuilt from that layout with openpyxl's write-only mode, so a
+workbook streams straight to bytes. Bills are built in worker processes and
+written into the zip one at a time, so the parent's memory stays flat as the
+fleet grows.
+"""
+import glob
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+
+from billing import summarize_fleet
+
+TEMPLATE_DIR  = "excel"
+FIRST_DAY_ROW = 8
+LAST_COLUMN   = 9          # A..I
+STYLE_ATTRS   = ("font", "fill", "border", "alignment", "number_format", "protection")
+_REF_RE = re.compile(r"(?<![A-Za-z0-9_])(\$?[A-Z]{1,3}\$?)(\d+)")
+
+_templates = None          # per process: sheet title -> layout
+
+
+def _snapshot(cell):
+    snap = {"value": cell.value}
+    if cell.has_style:
+        for attr in STYLE_ATTRS:
+            snap[attr] = copy(getattr(cell, attr))
+    return snap
+
+
+def _row(ws, r):
+    return [_snapshot(ws.cell(row=r, column=c)) for c in range(1, LAST_COLUMN + 1)]
+
+
+def _layout(ws):
+    footer_start = FIRST_DAY_ROW
+    while isinstance(ws.cell(row=footer_start, column=1).value, int):
+        footer_start += 1
+    return {
+        "title":        ws.title,
+        "header":       [_row(ws, r) for r in range(1, FIRST_DAY_ROW)],
+        "day":          _row(ws, FIRST_DAY_ROW),
+        "footer":       [_row(ws, r) for r in range(footer_start, ws.max_row + 1)],
+        "footer_start": footer_start,
+        "merged":       [str(m) for m in ws.merged_cells.ranges],
+        "widths":       {k: d.width for k, d in ws.column_dimensions.items() if d.width},
+        "heights":      {k: d.height for k, d in ws.row_dimensions.items() if d.height},
+    }
+
+
+def load_templates(template_dir=TEMPLATE_DIR):
+    """Layouts for every sheet in every template workbook, keyed by sheet title."""
+    layouts = {}
+    for path in sorted(glob.glob(os.path.join(template_dir, "*.xlsx"))):
+        wb = load_workbook(path)
+        for ws in wb.worksheets:
+            layouts.setdefault(ws.title, _layout(ws))
+    return layouts
+
+
+def _templates_for(template_dir):
+    global _templates
+    if _templates is None:
+        _templates = load_templates(template_dir)
+    return _templates
+
+
+def _to_number(value):
+    if isinstance(value, str):
+        text = value.replace(",", "").strip()
+        for cast in (int, float):
+            try:
+                return cast(text)
+            except ValueError:
+                pass
+    return value
+
+
+def _to_time(value):
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value.strip(), "%I:%M %p").time()
+        except ValueError:
+            pass
+    return value
+
+
+def _day_values(row):
+    """Sheet row C..I (as read from Sheets) -> typed cell values."""
+    row = list(row) + [""] * (7 - len(row))
+    opening, closing, total, start, end, ot, remarks = row[:7]
+    return [_to_number(opening), _to_number(closing), _to_number(total),
+            _to_time(start), _to_time(end), _to_number(ot), remarks]
+
+
+def _cell(ws, snap, value, styles):
+    """Write-only cell styled like snap. Registering a style with the workbook is
+    the slow part, so each snapshot's style array is registered once per bill."""
+    cell = WriteOnlyCell(ws, value=None if value == "" else value)
+    key = id(snap)
+    if key in styles:
+        cell._style = copy(styles[key])
+    else:
+        for attr in STYLE_ATTRS:
+            if attr in snap:
+                setattr(cell, attr, snap[attr])
+        styles[key] = copy(cell._style)
+    return cell
+
+
+def _footer_counts(layout, totals):
+    """{footer label: quantity (column E)} for the charges summarize_fleet counts.
+    Extra Kms is the month's km over the allowance on the "Amount for" row."""
+    allowance = next((snaps[4]["value"] for snaps in layout["footer"]
+                      if str(snaps[0]["value"] or "").strip().lower().startswith("amount for")
+                      and isinstance(snaps[4]["value"], (int, float))), None)
+    counts = {"sunday": totals["sunday"], "night charge": totals["night"] + 2 * totals["night_night"]}
+    if allowance is not None:
+        counts["extra kms"] = max(0, totals["total_km"] - allowance)
+    return counts
+
+
+def build_bill(layout, car, sheet, rows, year, month, days, title, totals=None):
+    """Return the .xlsx bytes for one car. rows are the sheet's C8:I38 values and
+    totals its summarize_fleet figures (None keeps the template's footer counts)."""
+    shift    = days - (layout["footer_start"] - FIRST_DAY_ROW)
+    last_day = FIRST_DAY_ROW + days - 1
+
+    def move(r):
+        if r >= layout["footer_start"]:
+            return r + shift
+        if r == layout["footer_start"] - 1:
+            return last_day
+        return r
+
+    def move_formula(value):
+        if isinstance(value, str) and value.startswith("="):
+            return _REF_RE.sub(lambda m: f"{m.group(1)}{move(int(m.group(2)))}", value)
+        return value
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(car)
+    for col, width in layout["widths"].items():
+        ws.column_dimensions[col].width = width
+    for r, height in layout["heights"].items():
+        ws.row_dimensions[move(r)].height = height
+    merged = []
+    for ref in layout["merged"]:
+        rng = CellRange(ref)
+        merged.append(CellRange(min_col=rng.min_col, min_row=move(rng.min_row),
+                                max_col=rng.max_col, max_row=move(rng.max_row)).coord)
+    ws.merged_cells = MultiCellRange(merged)
+
+    # No template tab for this car: keep the layout but drop the other car's details.
+    generic = layout["title"] != sheet
+    styles  = {}
+    for r, snaps in enumerate(layout["header"], start=1):
+        values = [s["value"] for s in snaps]
+        if r == 3:
+            values[0] = title
+        if r == 4 and generic:
+            values = [f"Vehicle Reg. No.  :  {car}"] + [None] * (LAST_COLUMN - 1)
+        if r == 5 and generic:
+            values = [None] * LAST_COLUMN
+        ws.append([_cell(ws, s, v, styles) for s, v in zip(snaps, values)])
+
+    for day in range(1, days + 1):
+        sheet_row = rows[day - 1] if day - 1 < len(rows) else []
+        values = [day, datetime(year, month, day)] + _day_values(sheet_row)
+        ws.append([_cell(ws, s, v, styles) for s, v in zip(layout["day"], values)])
+
+    counts = _footer_counts(layout, totals) if totals else {}
+    for snaps in layout["footer"]:
+        values = [move_formula(s["value"]) for s in snaps]
+        label  = str(values[0] or "").strip().lower()
+        if label in counts:
+            values[4] = counts[label]
+        ws.append([_cell(ws, s, v, styles) for s, v in zip(snaps, values)])
+
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def _bill_job(job):
+    """Process-pool entry point: (car, sheet, rows, totals, year, month, days, title, template_dir)."""
+    car, sheet, rows, totals, year, month, days, title, template_dir = job
+    layouts = _templates_for(template_dir)
+    layout  = layouts.get(sheet) or next(iter(layouts.values()))
+    return f"{car}.xlsx", build_bill(layout, car, sheet, rows, year, month, days, title, totals)
+
+
+def export_bills(fleet_rows, sheets, year, month, days, title, out,
+                 processes=None, template_dir=TEMPLATE_DIR):
+    """Write a zip of one bill per car to the file object `out`.
+
+    fleet_rows maps car -> its C8:I38 rows and sheets maps car -> sheet tab.
+    At most 2 x processes bills are in flight, so memory doesn't grow with the fleet.
+    """
+    processes = processes or min(4, os.cpu_count() or 1)
+    totals = summarize_fleet(fleet_rows, year, month)["cars"]
+    jobs = [(car, sheets[car], rows, totals[car], year, month, days, title, template_dir)
+            for car, rows in fleet_rows.items()]
+    ctx = multiprocessing.get_context("spawn")
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=ctx) as pool:
+        window = []
+        for job in jobs:
+            window.append(pool.submit(_bill_job, job))
+            if len(window) >= processes * 2:
+                name, data = window.pop(0).result()
+                zf.writestr(name, data)
+        for fut in window:
+            name, data = fut.result()
+            zf.writestr(name, data)
+    return len(jobs)
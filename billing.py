@@ -0,0 +1,132 @@
+"""Billing rules for the daily log: OT hours and Night / Night/Night / Sunday remarks.
+
+calculate_ot / get_remarks work on one entry at POST time. summarize_fleet
+applies the same rules to whole months at once: every car's C8:I38 block is
+stacked into (cars x 31) NumPy arrays and the month totals come out of a
+handful of array operations.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+OT_AFTER_HOURS  = 12
+NIGHT_START_MIN = 5 * 60      # started before 05:00
+NIGHT_END_MIN   = 22 * 60     # finished at or after 22:00
+MONTH_DAYS      = 31
+
+
+def hours_between(start, end):
+    d1 = datetime.combine(date.today(), start)
+    d2 = datetime.combine(date.today(), end)
+    if d2 < d1:
+        d2 += timedelta(days=1)
+    return (d2 - d1).total_seconds() / 3600
+
+def calculate_ot(start, end):
+    hrs = hours_between(start, end)
+    extra = hrs - OT_AFTER_HOURS
+    if extra <= 0:
+        return 0
+    full_hours = int(extra)
+    fraction   = extra - full_hours
+    if fraction > 0.5:
+        return full_hours + 1
+    elif full_hours == 0:
+        return 0
+    else:
+        return full_hours
+
+def get_remarks(start, end, date):
+    night_start = start < time(5, 0)
+    night_end   = end >= time(22, 0)
+    sunday      = date.weekday() == 6
+    parts = []
+    if night_start and night_end:
+        parts.append("Night/Night")
+    elif night_start or night_end:
+        parts.append("Night")
+    if sunday:
+        parts.append("Sunday")
+    return "/".join(parts)
+
+
+# ---------- Vectorized month aggregation ----------
+def _sheet_minutes(value, cache):
+    """'08:30 PM' (as Sheets formats column F/G) -> minutes after midnight, -1 if blank/bad."""
+    hit = cache.get(value)
+    if hit is None:
+        try:
+            t = datetime.strptime(str(value).strip(), "%I:%M %p")
+            hit = t.hour * 60 + t.minute
+        except ValueError:
+            hit = -1
+        cache[value] = hit
+    return hit
+
+def _sheet_number(value):
+    try:
+        return float(str(value).replace(",", ""))
+    except ValueError:
+        return np.nan
+
+def month_arrays(blocks):
+    """Stack C8:I38 blocks into (cars x 31) arrays of km, start and end minutes."""
+    n     = len(blocks)
+    km    = np.full((n, MONTH_DAYS), np.nan)
+    start = np.full((n, MONTH_DAYS), -1, dtype=np.int32)
+    end   = np.full((n, MONTH_DAYS), -1, dtype=np.int32)
+    cache = {}
+    for i, rows in enumerate(blocks):
+        for d, row in enumerate(rows[:MONTH_DAYS]):
+            if len(row) > 2 and str(row[2]).strip() != "":
+                km[i, d] = _sheet_number(row[2])
+            if len(row) > 4:
+                start[i, d] = _sheet_minutes(row[3], cache)
+                end[i, d]   = _sheet_minutes(row[4], cache)
+    return km, start, end
+
+def ot_hours(start, end):
+    """calculate_ot over arrays of start/end minutes (overnight shifts wrap)."""
+    seconds = ((end - start) % (24 * 60)) * 60.0
+    extra   = seconds / 3600 - OT_AFTER_HOURS
+    full    = np.floor(extra)
+    frac    = extra - full
+    ot = np.where(frac > 0.5, full + 1, np.where(full == 0, 0, full))
+    return np.where(extra <= 0, 0, ot).astype(np.int32)
+
+def summarize_fleet(fleet_rows, year, month):
+    """Month totals per car plus fleet-wide sums.
+
+    fleet_rows maps car -> its C8:I38 rows. A day counts once it has both times.
+    """
+    cars = list(fleet_rows)
+    km, start, end = month_arrays([fleet_rows[c] for c in cars])
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    in_month = np.arange(MONTH_DAYS) < days_in_month
+    sundays  = np.array([d < days_in_month and date(year, month, d + 1).weekday() == 6
+                         for d in range(MONTH_DAYS)])
+    timed = (start >= 0) & (end >= 0) & in_month
+
+    ot          = np.where(timed, ot_hours(start, end), 0)
+    night_start = timed & (start < NIGHT_START_MIN)
+    night_end   = timed & (end >= NIGHT_END_MIN)
+    night_night = night_start & night_end
+    night       = night_start ^ night_end
+    sunday      = timed & sundays
+
+    columns = {
+        "days_filled": timed.sum(axis=1),
+        "total_km":    np.nansum(np.where(in_month, km, np.nan), axis=1),
+        "ot_hours":    ot.sum(axis=1),
+        "night":       night.sum(axis=1),
+        "night_night": night_night.sum(axis=1),
+        "sunday":      sunday.sum(axis=1),
+    }
+    per_car = {
+        car: {name: int(values[i]) for name, values in columns.items()}
+        for i, car in enumerate(cars)
+    }
+    fleet = {name: int(values.sum()) for name, values in columns.items()}
+    return {"year": year, "month": month, "days": days_in_month, "cars": per_car, "fleet": fleet}
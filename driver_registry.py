@@ -0,0 +1,133 @@
+"""driver.json as an indexed, hot-reloading registry.
+
+Login codes are never kept in memory in plaintext: each one is stored as an
+HMAC-SHA256 under a random per-process salt. The code -> car index is keyed on
+the first 8 bytes of that digest and hmac.compare_digest checks the rest, so a
+login hashes the typed code once and costs the same with 4 cars or 400.
+
+The file is re-stat'ed at most every check_seconds and re-read when its mtime
+changes, so new vehicles can be onboarded by editing driver.json in place. A
+file that doesn't parse, or has an entry without file_id, sheet or code, is
+logged and the last good copy keeps serving.
+"""
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+from time import monotonic
+
+from telemetry import log
+
+REQUIRED_FIELDS = ("file_id", "sheet", "code")
+
+
+def validate(raw):
+    """Raise ValueError unless raw is {car: {file_id, sheet, code, ...}}."""
+    if not isinstance(raw, dict):
+        raise ValueError("driver.json must be an object of car -> details")
+    for car, info in raw.items():
+        if not isinstance(info, dict):
+            raise ValueError(f"{car}: expected an object, got {type(info).__name__}")
+        missing = [name for name in REQUIRED_FIELDS if not info.get(name)]
+        if missing:
+            raise ValueError(f"{car}: missing {', '.join(missing)}")
+
+
+class DriverRegistry:
+    def __init__(self, path, check_seconds=2.0):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._salt = secrets.token_bytes(16)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self._drivers = {}      # car -> info without "code"
+        self._by_code = {}      # digest[:8] -> (digest, car)
+        self._by_file = {}      # file_id -> [car, ...]
+        self._reload(os.stat(path).st_mtime_ns, strict=True)
+
+    def _digest(self, code):
+        return hmac.new(self._salt, str(code).encode(), hashlib.sha256).digest()
+
+    def _reload(self, mtime, strict=False):
+        try:
+            with open(self.path) as f:
+                raw = json.load(f)
+            validate(raw)
+        except (OSError, ValueError) as e:
+            if strict:
+                raise
+            # Half-saved or bad edit: keep serving the last good copy and try
+            # again when the file changes.
+            log("error", "drivers.reload_failed", path=self.path, error=str(e))
+            with self._lock:
+                self._mtime = mtime
+            return
+        drivers, by_code, by_file = {}, {}, {}
+        for car, info in raw.items():
+            info = dict(info)
+            digest = self._digest(info.pop("code"))
+            if digest[:8] in by_code:
+                first = by_code[digest[:8]][1]
+                log("warning", "drivers.duplicate_code", car=car, kept=first)
+            else:
+                by_code[digest[:8]] = (digest, car)
+            drivers[car] = info
+            by_file.setdefault(info["file_id"], []).append(car)
+        with self._lock:
+            self._drivers, self._by_code, self._by_file = drivers, by_code, by_file
+            self._mtime = mtime
+        if not strict:
+            log("info", "drivers.reloaded", path=self.path, cars=len(drivers))
+
+    def _refresh(self):
+        now = monotonic()
+        if now - self._checked < self.check_seconds:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            self._reload(mtime)
+
+    def car_for_code(self, code):
+        """Car whose login code is `code`, or None."""
+        self._refresh()
+        digest = self._digest(code)
+        with self._lock:
+            hit = self._by_code.get(digest[:8])
+        if hit is None or not hmac.compare_digest(hit[0], digest):
+            return None
+        return hit[1]
+
+    def get(self, car):
+        self._refresh()
+        return self._drivers.get(car)
+
+    def __contains__(self, car):
+        return self.get(car) is not None
+
+    def __getitem__(self, car):
+        info = self.get(car)
+        if info is None:
+            raise KeyError(car)
+        return info
+
+    def snapshot(self):
+        """{car: info} as of now. A reload swaps in new dicts, so this never changes under you."""
+        self._refresh()
+        return self._drivers
+
+    def keys(self):
+        return list(self.snapshot())
+
+    def by_file(self):
+        """{file_id: {car: info}} so batch jobs can make one call per spreadsheet."""
+        self._refresh()
+        with self._lock:
+            drivers, by_file = self._drivers, self._by_file
+        return {file_id: {car: drivers[car] for car in cars} for file_id, cars in by_file.items()}
@@ -0,0 +1,17 @@
+# gunicorn settings, picked up by start.sh and render.yaml (gunicorn -c gunicorn.conf.py app:app).
+#
+# Threaded workers: a slow Groq/Sheets/push call holds one thread, not the
+# whole worker, so /entry keeps answering while a /transcribe is in flight.
+# Every outbound client in app.py is safe to share across threads (per-thread
+# httplib2 for Sheets, pooled requests.Sessions for Groq and push, one
+# MongoClient per process).
+import os
+
+bind              = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class      = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers           = int(os.getenv("WEB_CONCURRENCY", "1"))      # free tier: 512 MB, keep one process
+threads           = int(os.getenv("GUNICORN_THREADS", "16"))
+timeout           = int(os.getenv("GUNICORN_TIMEOUT", "120"))  # bill export can take a while
+graceful_timeout  = 30
+keepalive         = 5
+accesslog         = os.getenv("GUNICORN_ACCESS_LOG") or None
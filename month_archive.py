@@ -0,0 +1,201 @@
+"""Month-end archive of the daily log.
+
+The admin reset wipes C8:I{7+days} for every car. Before it does, app.py
+snapshots each car's month into this archive. Each car and month is one
+document that stores the filled days column-wise (day, opening, closing,
+total_km, start, end, ot, remarks), plus the month totals.
+
+Documents go to the MongoDB collection month_archive, indexed on (car, year,
+month), when Mongo is configured. Otherwise, or if Mongo fails, they go to one
+gzipped JSON file per month (archive/YYYY-MM.json.gz). Reads merge both, so
+nothing archived during a Mongo outage is lost.
+
+A range query only loads the months the range touches. Totals are
+recomputed with billing.summarize_fleet, so partial months follow the same
+rules as the bills.
+"""
+import calendar
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime
+
+from pymongo import ASCENDING, ReplaceOne
+
+from billing import summarize_fleet
+from telemetry import log, span
+
+COLUMNS      = ["opening", "closing", "total_km", "start", "end", "ot", "remarks"]
+DATE_FORMATS = ("%d-%b-%y", "%d-%b-%Y", "%Y-%m-%d", "%d/%m/%Y")
+MONTH_DAYS   = 31
+
+
+def sheet_period(date_cells):
+    """(year, month) from the sheet's date column (B8:B38), None if unreadable."""
+    for cell in date_cells:
+        for fmt in DATE_FORMATS:
+            try:
+                d = datetime.strptime(str(cell).strip(), fmt)
+                return d.year, d.month
+            except ValueError:
+                continue
+    return None
+
+
+def month_doc(car, info, year, month, rows):
+    """Archive document for one car's C8:I38 rows, or None if no day is filled."""
+    days_in_month = calendar.monthrange(year, month)[1]
+    doc = {"_id": f"{car}:{year:04d}-{month:02d}", "car": car, "year": year, "month": month,
+           "file_id": info.get("file_id"), "sheet": info.get("sheet"), "day": []}
+    doc.update({name: [] for name in COLUMNS})
+    for d, row in enumerate(rows[:days_in_month], start=1):
+        if not row or all(str(v).strip() == "" for v in row):
+            continue
+        row = list(row) + [""] * (len(COLUMNS) - len(row))
+        doc["day"].append(d)
+        for name, value in zip(COLUMNS, row):
+            doc[name].append("" if value is None else str(value))
+    if not doc["day"]:
+        return None
+    doc["totals"] = summarize_fleet({car: rows}, year, month)["cars"][car]
+    doc["archived_at"] = datetime.utcnow().isoformat(timespec="seconds")
+    return doc
+
+
+def block_rows(doc, first_day=1, last_day=MONTH_DAYS):
+    """The document's days between first_day and last_day as 31 C:I rows."""
+    rows = [[] for _ in range(MONTH_DAYS)]
+    for i, d in enumerate(doc["day"]):
+        if first_day <= d <= last_day:
+            rows[d - 1] = [doc[name][i] for name in COLUMNS]
+    return rows
+
+
+def months_between(start, end):
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        yield y, m
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def day_bounds(year, month, start, end):
+    first = start.day if (year, month) == (start.year, start.month) else 1
+    last  = end.day if (year, month) == (end.year, end.month) else MONTH_DAYS
+    return first, last
+
+
+class MonthArchive:
+    def __init__(self, get_db, directory="archive"):
+        """get_db() returns the Mongo database, or None when Mongo isn't available."""
+        self.get_db = get_db
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._indexed = False
+
+    # ---------- Storage ----------
+    def _collection(self):
+        db = self.get_db()
+        if db is None:
+            return None
+        col = db["month_archive"]
+        if not self._indexed:
+            with span("mongo", "create_index"):
+                col.create_index([("car", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)])
+                col.create_index([("year", ASCENDING), ("month", ASCENDING)])
+            self._indexed = True
+        return col
+
+    def _path(self, year, month):
+        return os.path.join(self.directory, f"{year:04d}-{month:02d}.json.gz")
+
+    def _file_load(self, year, month):
+        try:
+            with gzip.open(self._path(year, month), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _file_save(self, year, month, docs):
+        """Merge docs into the month's file; temp file and rename, like the subs file."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            merged = self._file_load(year, month)
+            merged.update({d["car"]: d for d in docs})
+            path = self._path(year, month)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(merged, f, separators=(",", ":"))
+            os.replace(tmp, path)
+
+    def save(self, docs):
+        """Store (or replace) car-month documents. Returns the backend used."""
+        if not docs:
+            return None
+        try:
+            col = self._collection()
+            if col is not None:
+                with span("mongo", "bulk_write"):
+                    col.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+                                   ordered=False)
+                log("info", "archive.saved", backend="mongo", docs=len(docs))
+                return "mongo"
+        except Exception as e:
+            log("error", "archive.save_failed", backend="mongo", error=str(e))
+        by_month = {}
+        for d in docs:
+            by_month.setdefault((d["year"], d["month"]), []).append(d)
+        for (year, month), month_docs in by_month.items():
+            self._file_save(year, month, month_docs)
+        log("info", "archive.saved", backend="file", docs=len(docs))
+        return "file"
+
+    def load_month(self, year, month, car=None):
+        """{car: doc} for one month, from the file and Mongo (Mongo wins)."""
+        docs = self._file_load(year, month)
+        if car is not None:
+            docs = {car: docs[car]} if car in docs else {}
+        try:
+            col = self._collection()
+            if col is not None:
+                query = {"year": year, "month": month}
+                if car is not None:
+                    query["car"] = car
+                with span("mongo", "find"):
+                    docs.update({d["car"]: d for d in col.find(query)})
+        except Exception as e:
+            log("error", "archive.load_failed", backend="mongo", error=str(e))
+        return docs
+
+    # ---------- Queries ----------
+    def _months(self, start, end, car=None):
+        """(year, month, {car: doc}, first_day, last_day) for each archived month in range."""
+        for year, month in months_between(start, end):
+            docs = self.load_month(year, month, car)
+            if docs:
+                yield (year, month, docs) + day_bounds(year, month, start, end)
+
+    def totals(self, start, end, car=None):
+        """Per-car and fleet totals between two dates (inclusive), plus the car's
+        archived days when car is given."""
+        per_car, fleet, months, days = {}, {}, [], []
+        for year, month, docs, first, last in self._months(start, end, car):
+            months.append(f"{year:04d}-{month:02d}")
+            summary = summarize_fleet({c: block_rows(d, first, last) for c, d in docs.items()},
+                                      year, month)
+            for c, values in summary["cars"].items():
+                acc = per_car.setdefault(c, dict.fromkeys(values, 0))
+                for name, value in values.items():
+                    acc[name] += value
+            for name, value in summary["fleet"].items():
+                fleet[name] = fleet.get(name, 0) + value
+            if car is not None:
+                doc = docs[car]
+                days += [dict({"date": date(year, month, d).isoformat()},
+                              **{name: doc[name][i] for name in COLUMNS})
+                         for i, d in enumerate(doc["day"]) if first <= d <= last]
+        result = {"from": start.isoformat(), "to": end.isoformat(), "months": months,
+                  "cars": per_car, "fleet": fleet}
+        if car is not None:
+            result["days"] = days
+        return result
@@ -1,9 +1,14 @@
-const CACHE_NAME = "brajwasi-v15";
+const CACHE_NAME = "brajwasi-v19";
+const OUTBOX_DB  = "brajwasi-outbox";
+const SYNC_TAG   = "entry-outbox";
+const POST_TIMEOUT_MS = 4000;
 
+// Pages link their CSS and images through hashed /assets/ URLs, which are
+// cached on first use. The icons stay under /static/ for the manifest and
+// notifications.
 const ASSETS = [
   "/",
   "/entry",
-  "/static/style.css",
   "/static/icons/icon-192.png",
   "/static/icons/icon-512.png",
   "/manifest.json"
@@ -27,20 +32,182 @@ self.addEventListener("activate", event => {
   self.clients.claim();
 });
 
+// Static files are served stale-while-revalidate. Pages stay network-first
+// (below): "/" depends on the session and /entry is rendered with today's
+// date, so a cached copy is only used offline.
+const SHELL_PATHS = ["/manifest.json"];
+const SHELL_PREFIXES = ["/static/", "/assets/"];
+
+function isShell(url) {
+  return SHELL_PATHS.includes(url.pathname) || SHELL_PREFIXES.some(p => url.pathname.startsWith(p));
+}
+
+// ---------- Entry outbox (IndexedDB) ----------
+function openOutbox() {
+  return new Promise((resolve, reject) => {
+    const req = indexedDB.open(OUTBOX_DB, 1);
+    req.onupgradeneeded = () => req.result.createObjectStore("entries", { keyPath: "id", autoIncrement: true });
+    req.onsuccess = () => resolve(req.result);
+    req.onerror = () => reject(req.error);
+  });
+}
+
+function outboxTx(mode, fn) {
+  return openOutbox().then(db => new Promise((resolve, reject) => {
+    const tx = db.transaction("entries", mode);
+    const result = fn(tx.objectStore("entries"));
+    tx.oncomplete = () => { db.close(); resolve(result && result.result); };
+    tx.onerror = () => { db.close(); reject(tx.error); };
+  }));
+}
+
+function queueEntry(body) {
+  return outboxTx("readwrite", store => store.add({ body, queued_at: Date.now() }))
+    .then(() => self.registration.sync && self.registration.sync.register(SYNC_TAG))
+    .catch(err => console.log("Outbox sync register failed", err));
+}
+
+let flushing = null;
+
+// Entries the server refused (e.g. 409: the sheet has moved on to the next
+// month). They stay in the outbox, marked failed, until the driver dismisses
+// them, so nothing the page called "saved on this phone" vanishes unseen.
+function failedEntries() {
+  return outboxTx("readonly", store => store.getAll()).then(items => (items || []).filter(i => i.failed));
+}
+
+async function reportFailed(client) {
+  const items = await failedEntries();
+  const targets = client ? [client] : await self.clients.matchAll({ type: "window" });
+  targets.forEach(c => c.postMessage({ type: "outbox-failed", items }));
+}
+
+// Replays queued entries oldest first. 2xx is final (the server dedupes by
+// client_id). 401/403 mean nobody, or another car, is logged in: the entry
+// stays queued for when its driver logs in again. Any other 4xx marks the
+// entry failed and tells the open pages. 5xx or no network stops the run and
+// leaves the rest for the next sync.
+function flushOutbox() {
+  if (flushing) return flushing;
+  flushing = outboxTx("readonly", store => store.getAll())
+    .then(async items => {
+      let refused = false;
+      for (const item of items || []) {
+        if (item.failed) continue;
+        const res = await fetch("/api/entry", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          credentials: "same-origin",
+          body: item.body
+        });
+        if (res.status >= 500) throw new Error("Server busy: " + res.status);
+        if (res.status === 401 || res.status === 403) continue;
+        if (res.status >= 400) {
+          let error = "Refused by the server (" + res.status + ")";
+          try { error = (await res.json()).error || error; } catch (err) {}
+          const failed = { ...item, failed: { status: res.status, error, at: Date.now() } };
+          await outboxTx("readwrite", store => store.put(failed));
+          refused = true;
+          continue;
+        }
+        await outboxTx("readwrite", store => store.delete(item.id));
+      }
+      if (refused) await reportFailed();
+    })
+    .finally(() => { flushing = null; });
+  return flushing;
+}
+
+function fetchWithTimeout(request, ms) {
+  return Promise.race([
+    fetch(request),
+    new Promise((_, reject) => setTimeout(() => reject(new Error("timeout")), ms))
+  ]);
+}
+
+function queuedResponse() {
+  return new Response(JSON.stringify({ ok: true, queued: true }), {
+    status: 202, headers: { "Content-Type": "application/json" }
+  });
+}
+
+async function postEntry(request) {
+  const body = await request.clone().text();
+  try {
+    const res = await fetchWithTimeout(request, POST_TIMEOUT_MS);
+    if (res.status < 500) return res;
+  } catch (err) {
+    // offline or too slow: queue below
+  }
+  await queueEntry(body);
+  return queuedResponse();
+}
+
+self.addEventListener("sync", event => {
+  if (event.tag === SYNC_TAG) event.waitUntil(flushOutbox());
+});
+
+self.addEventListener("message", event => {
+  if (event.data && event.data.type === "flush-outbox") {
+    event.waitUntil(flushOutbox().catch(err => console.log("Outbox flush failed", err))
+      .then(() => reportFailed(event.source)));
+  }
+  if (event.data && event.data.type === "outbox-dismiss") {
+    event.waitUntil(outboxTx("readwrite", store => store.delete(event.data.id))
+      .then(() => reportFailed(event.source)));
+  }
+});
+
+// ---------- Fetch ----------
 self.addEventListener("fetch", event => {
-  const url = event.request.url;
+  const url = new URL(event.request.url);
 
-  if (!url.startsWith("http://") && !url.startsWith("https://")) return;
+  if (url.protocol !== "http:" && url.protocol !== "https:") return;
+
+  if (event.request.method === "POST" && url.origin === self.location.origin &&
+      url.pathname === "/api/entry") {
+    event.respondWith(postEntry(event.request));
+    return;
+  }
   if (event.request.method !== "GET") return;
 
+  // Logging out must not leave the previous driver's page in the cache.
+  if (url.pathname === "/logout" || url.pathname === "/hard-reset") {
+    event.waitUntil(caches.open(CACHE_NAME).then(cache => cache.delete("/entry")));
+    return;
+  }
+
+  if (url.origin === self.location.origin && isShell(url)) {
+    event.respondWith(
+      caches.open(CACHE_NAME).then(cache =>
+        cache.match(event.request).then(cached => {
+          const network = fetch(event.request)
+            .then(response => {
+              if (response && response.status === 200 && !response.redirected) {
+                cache.put(event.request, response.clone());
+              }
+              return response;
+            });
+          if (cached) {
+            event.waitUntil(network.catch(() => {}));
+            return cached;
+          }
+          return network.catch(() => caches.match("/"));
+        })
+      )
+    );
+    return;
+  }
+
   event.respondWith(
     fetch(event.request)
       .then(response => {
         if (
           response &&
           response.status === 200 &&
+          !response.redirected &&
           response.type !== "opaque" &&
-          url.startsWith(self.location.origin)
+          url.origin === self.location.origin
         ) {
           const clone = response.clone();
           caches.open(CACHE_NAME).then(cache => cache.put(event.request, clone));
@@ -0,0 +1,98 @@
+"""Sheets v4 client shared by every worker thread.
+
+- The service is built on first use from the discovery document bundled with
+  google-api-python-client (no network fetch, no file cache), so importing
+  the app doesn't pay for it.
+- googleapiclient rebuilds a Resource (and its docstrings) on every
+  spreadsheets().values() call, which costs tens of ms. The values resource is
+  built once and reused; it holds no per-request state.
+- httplib2 isn't thread-safe, so each thread gets its own AuthorizedHttp.
+  httplib2 keeps connections alive, so a thread reuses its TLS connection.
+- A daemon thread refreshes the access token before it expires, so requests
+  never block on an OAuth round trip.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import httplib2
+from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp, Request
+from googleapiclient.discovery import build
+
+from telemetry import log, span
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+
+class SheetsClient:
+    def __init__(self, info, scopes=SCOPES, refresh_ahead=300, timeout=30, api_endpoint=None):
+        self.creds = service_account.Credentials.from_service_account_info(info, scopes=scopes)
+        self.api_endpoint = api_endpoint
+        self.refresh_ahead = refresh_ahead
+        self.timeout = timeout
+        self._values = None
+        self._build_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._local = threading.local()
+        self._clients = 0
+        self._refresher = None
+
+    def values(self):
+        """spreadsheets().values() resource, built once."""
+        if self._values is None:
+            with self._build_lock:
+                if self._values is None:
+                    options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+                    service = build("sheets", "v4", credentials=self.creds, client_options=options,
+                                    static_discovery=True, cache_discovery=False)
+                    self._values = service.spreadsheets().values()
+        return self._values
+
+    def http(self):
+        """This thread's authorized httplib2 client."""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=self.timeout))
+            with self._build_lock:
+                self._clients += 1
+        return http
+
+    def refresh_token(self, force=False):
+        """Refresh the access token if it's missing or expires within refresh_ahead."""
+        with self._refresh_lock:
+            expiry = self.creds.expiry
+            if not force and self.creds.token and expiry and \
+                    expiry - datetime.utcnow() > timedelta(seconds=self.refresh_ahead):
+                return False
+            with span("oauth", "refresh"):
+                self.creds.refresh(Request(httplib2.Http(timeout=self.timeout)))
+            return True
+
+    def _refresh_loop(self, stop):
+        delay = 0
+        while not stop.wait(delay):
+            try:
+                self.values()
+                self.refresh_token()
+                left = (self.creds.expiry - datetime.utcnow()).total_seconds()
+                delay = max(30, left - self.refresh_ahead)
+            except Exception as e:
+                log("error", "sheets.token_refresh_failed", error=str(e), retry_in=30)
+                delay = 30
+
+    def start_refresher(self):
+        """Warm the service and keep the token fresh from a daemon thread."""
+        if self._refresher is None:
+            self._stop = threading.Event()
+            self._refresher = threading.Thread(target=self._refresh_loop, args=(self._stop,),
+                                               daemon=True, name="sheets-token")
+            self._refresher.start()
+        return self._refresher
+
+    def stats(self):
+        expiry = self.creds.expiry
+        return {
+            "built": self._values is not None,
+            "http_clients": self._clients,
+            "token_ttl_sec": int((expiry - datetime.utcnow()).total_seconds()) if expiry else None,
+        }
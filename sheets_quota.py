@@ -0,0 +1,160 @@
+"""Sheets API quota governor.
+
+Google allows a per-minute budget of read and write requests per project
+(and per user, which for a service account is the same thing). Every Sheets
+call in app.py goes through QuotaGovernor.call, which:
+
+- takes a token from the project's read or write bucket, waiting for one if
+  the bucket is empty;
+- keeps a reserve of tokens that only interactive (driver) calls may use, and
+  makes bulk jobs (journal flush, month reset, fleet reads) wait while a
+  driver is queued;
+- retries 429 and 5xx answers with jittered exponential backoff, honouring
+  Retry-After.
+
+Waits, retries and give-ups are counted in telemetry and in stats().
+"""
+import random
+import socket
+import threading
+from time import monotonic, sleep
+
+from googleapiclient.errors import HttpError
+
+from telemetry import inc, log, observe
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+WRITE_OPS      = {"update", "batchUpdate", "clear", "batchClear", "append"}
+
+
+class SheetsBusy(RuntimeError):
+    """Raised when a call can't get through within its budget. The message is shown to drivers."""
+
+    def __init__(self, detail=""):
+        super().__init__("Google Sheets is busy right now. Please try again in a minute.")
+        self.detail = detail
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst, reserve):
+        self.rate     = per_minute / 60.0
+        self.capacity = float(burst)
+        self.reserve  = float(reserve)
+        self.tokens   = float(burst)
+        self.updated  = monotonic()
+        self.cond     = threading.Condition()
+        self.interactive_waiting = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, interactive, timeout):
+        """Take one token. Returns seconds waited; raises SheetsBusy after timeout."""
+        started  = monotonic()
+        deadline = started + timeout
+        with self.cond:
+            if interactive:
+                self.interactive_waiting += 1
+            try:
+                while True:
+                    now = monotonic()
+                    self._refill(now)
+                    floor = 0.0 if interactive else self.reserve
+                    if self.tokens >= floor + 1 and (interactive or not self.interactive_waiting):
+                        self.tokens -= 1
+                        self.cond.notify_all()
+                        return now - started
+                    if now >= deadline:
+                        raise SheetsBusy("quota wait timed out")
+                    need = max(floor + 1 - self.tokens, 0.05) / self.rate
+                    self.cond.wait(min(need, deadline - now))
+            finally:
+                if interactive:
+                    self.interactive_waiting -= 1
+
+    def level(self):
+        with self.cond:
+            self._refill(monotonic())
+            return self.tokens
+
+
+class QuotaGovernor:
+    def __init__(self, reads_per_minute=60, writes_per_minute=60, burst_fraction=0.25,
+                 reserve_fraction=0.2, interactive_wait=8.0, bulk_wait=120.0,
+                 interactive_retries=3, bulk_retries=6, backoff_base=1.0, backoff_cap=32.0):
+        self.limits = {"read": reads_per_minute, "write": writes_per_minute}
+        self.burst_fraction = burst_fraction
+        self.reserve_fraction = reserve_fraction
+        self.waits   = {"interactive": interactive_wait, "bulk": bulk_wait}
+        self.retries = {"interactive": interactive_retries, "bulk": bulk_retries}
+        self.backoff_base = backoff_base
+        self.backoff_cap  = backoff_cap
+        self._buckets = {}
+        self._lock    = threading.Lock()
+        self._counts  = {"calls": 0, "throttled": 0, "retries": 0, "gave_up": 0}
+
+    def bucket(self, project, kind):
+        with self._lock:
+            b = self._buckets.get((project, kind))
+            if b is None:
+                per_minute = self.limits[kind]
+                burst = max(1, int(per_minute * self.burst_fraction))
+                b = self._buckets[(project, kind)] = TokenBucket(
+                    per_minute, burst, min(burst - 1, burst * self.reserve_fraction))
+            return b
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        if isinstance(error, HttpError):
+            try:
+                retry_after = float(error.resp.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0)
+
+    def call(self, fn, project, op, priority="interactive"):
+        """Run fn() under the read/write quota for project, retrying 429/5xx."""
+        kind   = "write" if op in WRITE_OPS else "read"
+        bucket = self.bucket(project, kind)
+        interactive = priority == "interactive"
+        deadline = monotonic() + self.waits[priority]
+        attempt  = 0
+        self._count("calls")
+        while True:
+            waited = bucket.acquire(interactive, max(0.0, deadline - monotonic()))
+            if waited > 0.001:
+                self._count("throttled")
+                inc("sheets_throttled_total", kind=kind, priority=priority)
+                observe("sheets_quota_wait_seconds", waited, kind=kind, priority=priority)
+            try:
+                return fn()
+            except (HttpError, socket.timeout, ConnectionError) as e:
+                status = e.resp.status if isinstance(e, HttpError) else "network"
+                if isinstance(e, HttpError) and status not in RETRY_STATUSES:
+                    raise
+                delay = self._backoff(attempt, e)
+                if attempt >= self.retries[priority] or monotonic() + delay > deadline:
+                    self._count("gave_up")
+                    inc("sheets_gave_up_total", status=status, priority=priority)
+                    log("error", "sheets.gave_up", op=op, status=status, priority=priority,
+                        attempts=attempt + 1, error=str(e))
+                    raise SheetsBusy(str(e)) from e
+                attempt += 1
+                self._count("retries")
+                inc("sheets_retries_total", status=status, priority=priority)
+                log("warning", "sheets.retry", op=op, status=status, priority=priority,
+                    attempt=attempt, delay=round(delay, 2))
+                sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            counts  = dict(self._counts)
+            buckets = dict(self._buckets)
+        counts["tokens"] = {kind: round(b.level(), 1) for (_, kind), b in buckets.items()}
+        return counts
@@ -1,3 +1,3 @@
 #!/bin/bash
 export FLASK_ENV=production
-gunicorn app:app --bind 0.0.0.0:$PORT
+gunicorn -c gunicorn.conf.py app:app
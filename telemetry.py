@@ -0,0 +1,153 @@
+"""Request timing, outbound call spans, Prometheus-style metrics and JSON logs.
+
+app.py opens a request context in before_request and closes it in
+after_request. Every outbound call (Sheets, Mongo, Groq, web push) runs inside
+span(service, op). That records its duration and outcome in a histogram,
+counts it against the current route, and adds it to the request's log line.
+render() writes everything in the Prometheus text format for /metrics.
+Metrics live in process memory, so each gunicorn worker reports its own.
+"""
+import contextvars
+import json
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from time import perf_counter
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock       = threading.Lock()
+_histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+_counters   = {}    # (name, labels) -> value
+_gauges     = {}    # (name, labels) -> value
+_request    = contextvars.ContextVar("request", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name, seconds, **labels):
+    with _lock:
+        h = _histograms.setdefault(_key(name, labels), [0] * (len(BUCKETS) + 2))
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        key = _key(name, labels)
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+# ---------- Requests and spans ----------
+def begin_request(request_id, method, route):
+    ctx = {"id": request_id, "method": method, "route": route,
+           "started": perf_counter(), "spans": {}}
+    _request.set(ctx)
+    return ctx
+
+
+def end_request(status):
+    """Record the request's duration and return its context (None outside a request)."""
+    ctx = _request.get()
+    if ctx is None:
+        return None
+    ctx["elapsed"] = perf_counter() - ctx["started"]
+    observe("http_request_duration_seconds", ctx["elapsed"],
+            route=ctx["route"], method=ctx["method"], status=status)
+    _request.set(None)
+    return ctx
+
+
+def current_route():
+    ctx = _request.get()
+    return ctx["route"] if ctx else "background"
+
+
+def bind(fn):
+    """Run fn in a copy of the caller's context, so spans in pool threads count
+    against the request that started them."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+@contextmanager
+def span(service, op):
+    """Time an outbound call: outbound_duration_seconds{service,op,outcome}."""
+    ctx = _request.get()
+    outcome = "ok"
+    started = perf_counter()
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = perf_counter() - started
+        observe("outbound_duration_seconds", elapsed, service=service, op=op, outcome=outcome)
+        inc("outbound_calls_total", service=service, route=ctx["route"] if ctx else "background")
+        if ctx is not None:
+            with _lock:
+                calls, total = ctx["spans"].get(service, (0, 0.0))
+                ctx["spans"][service] = (calls + 1, total + elapsed)
+
+
+# ---------- Logs ----------
+def log(level, event, **fields):
+    """One JSON object per line on stdout, tagged with the current request."""
+    record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+              "level": level, "event": event}
+    ctx = _request.get()
+    if ctx is not None:
+        record["request_id"] = ctx["id"]
+        record["route"] = ctx["route"]
+    record.update(fields)
+    sys.stdout.write(json.dumps(record, default=str, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+# ---------- Exposition ----------
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Everything recorded so far in the Prometheus text format."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters   = dict(_counters)
+        gauges     = dict(_gauges)
+    lines, typed = [], set()
+    for (name, labels), h in sorted(histograms.items()):
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(BUCKETS, h):
+            lines.append(f"{name}_bucket{_labels(labels, [('le', str(bound))])} {count}")
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {h[-1]}")
+        lines.append(f"{name}_sum{_labels(labels)} {h[-2]:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {h[-1]}")
+    for kind, values in (("counter", counters), ("gauge", gauges)):
+        for (name, labels), value in sorted(values.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,242 @@
+"""Rule-based parser for spoken odometer readings and times.
+
+Covers the grammar spelled out in TRANSCRIPT_PARSE_PROMPT (app.py): digit-by-digit
+readings, sau/hazaar/lakh place value and saade/paune/sawa/dhaai times. It only
+answers when the transcript is unambiguous; anything else returns None and
+/transcribe falls back to the LLM.
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+DIGITS = {
+    "sunya": 0, "shunya": 0, "zero": 0, "shoonya": 0,
+    "ek": 1, "one": 1,
+    "do": 2, "two": 2,
+    "teen": 3, "three": 3, "tin": 3,
+    "char": 4, "chaar": 4, "four": 4,
+    "paanch": 5, "panch": 5, "five": 5, "pach": 5,
+    "chhe": 6, "chheh": 6, "chhah": 6, "che": 6, "chah": 6, "six": 6,
+    "saat": 7, "seven": 7, "sat": 7,
+    "aath": 8, "aat": 8, "eight": 8,
+    "nau": 9, "nine": 9,
+}
+
+# Values only used in word-value mode (never concatenated as digits).
+COMPOUNDS = {
+    "das": 10, "ten": 10, "gyarah": 11, "gyara": 11, "barah": 12, "bara": 12,
+    "terah": 13, "tera": 13, "chaudah": 14, "chauda": 14, "pandrah": 15, "pandra": 15,
+    "solah": 16, "sola": 16, "satrah": 17, "satra": 17, "atharah": 18, "athara": 18,
+    "unnis": 19, "unees": 19, "bees": 20, "bis": 20, "twenty": 20, "pachchees": 25, "pachis": 25,
+    "tees": 30, "tis": 30, "thirty": 30, "paintees": 35, "chaalees": 40, "chalis": 40, "forty": 40,
+    "paintalees": 45, "pachaas": 50, "pachas": 50, "fifty": 50, "pachpan": 55,
+    "sattavan": 57, "saath": 60, "sixty": 60, "sattar": 70, "seventy": 70,
+    "assi": 80, "eighty": 80, "nabbe": 90, "ninety": 90,
+}
+
+MULTIPLIERS = {
+    "sau": 100, "hundred": 100,
+    "hazaar": 1000, "hazar": 1000, "hajar": 1000, "hajaar": 1000, "thousand": 1000,
+    "lakh": 100000, "laakh": 100000, "lac": 100000, "lakhs": 100000,
+    "crore": 10000000, "karod": 10000000,
+}
+
+# Whole Devanagari words (what Whisper returns with language "hi") -> the
+# romanised token the parser knows. Matched per token, never inside a word.
+DEVANAGARI = {
+    "शून्य": "sunya", "एक": "ek", "दो": "do", "तीन": "teen", "चार": "char",
+    "पांच": "paanch", "पाँच": "paanch", "छह": "chhe", "छः": "chhe", "छे": "chhe",
+    "सात": "saat", "आठ": "aath", "नौ": "nau",
+    "दस": "das", "ग्यारह": "gyarah", "बारह": "barah", "तेरह": "terah", "चौदह": "chaudah",
+    "पंद्रह": "pandrah", "पन्द्रह": "pandrah", "सोलह": "solah", "सत्रह": "satrah",
+    "अठारह": "atharah", "उन्नीस": "unnis", "बीस": "bees", "पच्चीस": "pachchees",
+    "तीस": "tees", "पैंतीस": "paintees", "चालीस": "chaalees", "पैंतालीस": "paintalees",
+    "पचास": "pachaas", "पचपन": "pachpan", "सत्तावन": "sattavan", "साठ": "saath",
+    "सत्तर": "sattar", "अस्सी": "assi", "नब्बे": "nabbe",
+    "सौ": "sau", "हज़ार": "hazaar", "हजार": "hazaar", "लाख": "lakh", "करोड़": "crore",
+    "बजे": "baje", "बजकर": "bajkar", "बजके": "bajke", "मिनट": "minute", "सुबह": "subah",
+    "दोपहर": "dopahar", "शाम": "shaam", "रात": "raat", "साढ़े": "saade", "पौने": "paune",
+    "सवा": "sawa", "ढाई": "dhaai", "डेढ़": "dedh",
+    "के": "ke", "का": "ka", "की": "ki", "है": "hai", "जी": "ji", "और": "aur", "हाँ": "haan",
+    "हां": "haan", "लगभग": "lagbhag", "किलोमीटर": "km",
+}
+DEVANAGARI = {unicodedata.normalize("NFC", k): v for k, v in DEVANAGARI.items()}
+
+FILLERS = {"um", "uh", "umm", "hmm", "matlab", "yaani", "woh", "wo", "toh", "to",
+           "haan", "han", "theek", "thik", "hai", "ji", "ke", "ka", "ki", "km",
+           "kilometer", "kilometre", "reading", "and", "aur", "at", "around", "lagbhag"}
+
+TIME_WORDS = {"baje", "bajke", "bajkar", "baj", "bajey", "minute", "minutes", "min",
+              "am", "pm", "subah", "dopahar", "shaam", "sham", "raat", "saade", "sade",
+              "paune", "sawa", "dhaai", "dhai", "dedh", "o'clock", "oclock"}
+
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+# Anything but word characters, Devanagari letters and their combining marks
+# (matras, virama, nukta are not \w), clock colons and decimal points is a
+# separator. The dandas (।, ॥) are punctuation.
+_SEPARATORS = re.compile(r"[^\w\u0900-\u0963\u0966-\u097F:'.]+|[.](?!\d)|(?<!\d)[.]")
+
+
+def normalize_transcript(text):
+    """Lowercase, romanise Devanagari number words and drop punctuation/fillers.
+
+    "7.30" stays one token, so a spoken time or a decimal is never read as the
+    number 730."""
+    text = unicodedata.normalize("NFC", (text or "").translate(_DEVANAGARI_DIGITS).lower())
+    text = re.sub(r"(\d),(\d)", r"\1\2", text)
+    tokens = (DEVANAGARI.get(t, t) for t in _SEPARATORS.sub(" ", text).split())
+    return " ".join(t for t in tokens if t not in FILLERS)
+
+
+def _value(token):
+    if token.isdigit():
+        return int(token)
+    if token in DIGITS:
+        return DIGITS[token]
+    return COMPOUNDS.get(token)
+
+
+def parse_number(tokens):
+    """Odometer-style number from tokens, or None when the reading is ambiguous."""
+    if not tokens:
+        return None
+    if len(tokens) == 1 and tokens[0].isdigit():
+        return int(tokens[0])
+
+    if not any(t in MULTIPLIERS for t in tokens):
+        # Digit-by-digit: every token is a single digit word/number.
+        if all(t in DIGITS or (t.isdigit() and len(t) == 1) for t in tokens):
+            return int("".join(str(_value(t)) for t in tokens))
+        if len(tokens) == 1:
+            return _value(tokens[0])
+        return None
+
+    # Word-value: multipliers must appear in decreasing order (lakh > hazaar > sau).
+    total, current, last_mult, prev_was_value = 0, 0, None, False
+    for t in tokens:
+        if t in MULTIPLIERS:
+            mult = MULTIPLIERS[t]
+            if last_mult is not None and mult >= last_mult and mult != 100:
+                return None
+            if mult == 100:
+                if current >= 100:
+                    return None
+                current = (current or 1) * 100
+            else:
+                total += (current or 1) * mult
+                current = 0
+                last_mult = mult
+            prev_was_value = False
+            continue
+        v = _value(t)
+        if v is None:
+            return None
+        # "bees paanch" without a multiplier between is ambiguous, but "sau nabbe"
+        # or "sau paanch" (after a multiplier) is fine.
+        if prev_was_value:
+            return None
+        current += v
+        prev_was_value = True
+    return total + current
+
+
+def _hhmm(hour, minute):
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_time(tokens):
+    """HH:MM from spoken time tokens, or None when AM/PM can't be settled."""
+    period = next((t for t in tokens if t in ("subah", "dopahar", "shaam", "sham", "raat", "am", "pm")), None)
+    words  = [t for t in tokens if t not in ("subah", "dopahar", "shaam", "sham", "raat", "am", "pm",
+                                             "baje", "bajey", "baj", "o'clock", "oclock")]
+
+    clock = next((t for t in words if re.fullmatch(r"\d{1,2}:\d{2}", t)), None)
+    if clock:
+        hour, minute = (int(x) for x in clock.split(":"))
+        words = [t for t in words if t != clock]
+        if words:
+            return None
+    elif words and words[0] in ("saade", "sade", "paune", "sawa"):
+        if len(words) != 2:
+            return None
+        base = _value(words[1])
+        if base is None or not 1 <= base <= 12:
+            return None
+        hour, minute = {"saade": (base, 30), "sade": (base, 30), "sawa": (base, 15),
+                        "paune": (base - 1 or 12, 45)}[words[0]]
+    elif words and words[0] in ("dhaai", "dhai", "dedh"):
+        if len(words) != 1:
+            return None
+        hour, minute = (2, 30) if words[0] != "dedh" else (1, 30)
+    else:
+        split = next((i for i, t in enumerate(words) if t in ("bajke", "bajkar")), None)
+        hour_tokens = words if split is None else words[:split]
+        rest        = [] if split is None else [t for t in words[split + 1:]
+                                                if t not in ("minute", "minutes", "min")]
+        if len(hour_tokens) != 1:
+            return None
+        hour = _value(hour_tokens[0])
+        minute = 0
+        if rest:
+            if len(rest) != 1:
+                return None
+            minute = _value(rest[0])
+        if hour is None or minute is None:
+            return None
+
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        return None
+    if period in ("pm", "shaam", "sham", "dopahar") and hour < 12:
+        if period == "dopahar" and hour > 4:
+            return None
+        hour += 12
+    elif period == "am" or period == "subah":
+        if hour == 12:
+            hour = 0
+    elif period == "raat":
+        if hour == 12:
+            hour = 0
+        elif 5 <= hour < 12:
+            hour += 12
+        elif hour < 5:
+            return None       # "raat ke do baje" could be 02:00 or a slip; let the LLM decide
+    return _hhmm(hour, minute)
+
+
+def parse_transcript(normalized):
+    """Number or HH:MM string for a normalized transcript, or None if not confident."""
+    tokens = normalized.split()
+    if not tokens:
+        return None
+    if any(t in TIME_WORDS for t in tokens) or any(re.fullmatch(r"\d{1,2}:\d{2}", t) for t in tokens):
+        return parse_time(tokens)
+    number = parse_number(tokens)
+    return None if number is None else str(number)
+
+
+class ParseCache:
+    """Thread-safe bounded LRU of normalized transcript -> parsed value."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)